@@ -0,0 +1,89 @@
+# This file exists within 'config-decorator':
+#
+#   https://github.com/hotoffthehamster/config-decorator
+#
+# Copyright © 2019-2020 Landon Bouma. All rights reserved.
+#
+# Permission is hereby granted,  free of charge,  to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge,  publish,  distribute, sublicense,
+# and/or  sell copies  of the Software,  and to permit persons  to whom the
+# Software  is  furnished  to do so,  subject  to  the following conditions:
+#
+# The  above  copyright  notice  and  this  permission  notice  shall  be
+# included  in  all  copies  or  substantial  portions  of  the  Software.
+#
+# THE  SOFTWARE  IS  PROVIDED  "AS IS",  WITHOUT  WARRANTY  OF ANY KIND,
+# EXPRESS OR IMPLIED,  INCLUDING  BUT NOT LIMITED  TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE  FOR ANY
+# CLAIM,  DAMAGES OR OTHER LIABILITY,  WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE,  ARISING FROM,  OUT OF  OR IN  CONNECTION WITH THE
+# SOFTWARE   OR   THE   USE   OR   OTHER   DEALINGS  IN   THE  SOFTWARE.
+
+
+"""Compares asobj, accessor, subscript, handle, and raw dict access.
+
+Run from the project root, e.g.,::
+
+    python -m benchmarks.bench_asobj
+"""
+
+import timeit
+
+from config_decorator import section
+
+NUMBER = 100000
+
+
+def generate_config():
+    @section(None)
+    class RootSection(object):
+        pass
+
+    @RootSection.section('a')
+    class SectionA(object):
+        pass
+
+    @SectionA.section('b')
+    class SectionB(object):
+        @property
+        @SectionA.setting(
+            "A deeply nested setting.",
+        )
+        def c(self):
+            return 'value'
+
+    return RootSection
+
+
+def report(label, seconds):
+    print('{:<24} {:>8.3f} µs/read'.format(label, seconds / NUMBER * 1e6))
+
+
+def main():
+    cfg = generate_config()
+    rawd = cfg.as_dict()
+    handle = cfg.handle('a.b.c')
+    acc = cfg.compile_accessors()
+    report("cfg.asobj.a.b.c.value", timeit.timeit(
+        lambda: cfg.asobj.a.b.c.value, number=NUMBER,
+    ))
+    report("acc.a.b.c", timeit.timeit(
+        lambda: acc.a.b.c, number=NUMBER,
+    ))
+    report("cfg['a.b.c']", timeit.timeit(
+        lambda: cfg['a.b.c'], number=NUMBER,
+    ))
+    report("handle.value", timeit.timeit(
+        lambda: handle.value, number=NUMBER,
+    ))
+    report("rawd['a']['b']['c']", timeit.timeit(
+        lambda: rawd['a']['b']['c'], number=NUMBER,
+    ))
+
+
+if __name__ == '__main__':
+    main()
+
@@ -0,0 +1,71 @@
+# This file exists within 'config-decorator':
+#
+#   https://github.com/hotoffthehamster/config-decorator
+#
+# Copyright © 2019-2020 Landon Bouma. All rights reserved.
+#
+# Permission is hereby granted,  free of charge,  to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge,  publish,  distribute, sublicense,
+# and/or  sell copies  of the Software,  and to permit persons  to whom the
+# Software  is  furnished  to do so,  subject  to  the following conditions:
+#
+# The  above  copyright  notice  and  this  permission  notice  shall  be
+# included  in  all  copies  or  substantial  portions  of  the  Software.
+#
+# THE  SOFTWARE  IS  PROVIDED  "AS IS",  WITHOUT  WARRANTY  OF ANY KIND,
+# EXPRESS OR IMPLIED,  INCLUDING  BUT NOT LIMITED  TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE  FOR ANY
+# CLAIM,  DAMAGES OR OTHER LIABILITY,  WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE,  ARISING FROM,  OUT OF  OR IN  CONNECTION WITH THE
+# SOFTWARE   OR   THE   USE   OR   OTHER   DEALINGS  IN   THE  SOFTWARE.
+
+
+"""Times exporting a full settings configuration with as_dict() and apply_items().
+
+Run from the project root, e.g.,::
+
+    python -m benchmarks.bench_export
+"""
+
+import timeit
+
+from config_decorator import section
+
+NUMBER = 1000
+N_SECTIONS = 20
+N_SETTINGS = 20
+
+
+def generate_config():
+    @section(None)
+    class RootSection(object):
+        pass
+
+    for sect_num in range(N_SECTIONS):
+        for set_num in range(N_SETTINGS):
+            RootSection.setdefault(
+                'section{}.setting{}'.format(sect_num, set_num), 'value',
+            )
+
+    return RootSection
+
+
+def report(label, seconds):
+    print('{:<24} {:>8.1f} µs/export'.format(label, seconds / NUMBER * 1e6))
+
+
+def main():
+    cfg = generate_config()
+    report("cfg.as_dict()", timeit.timeit(
+        lambda: cfg.as_dict(), number=NUMBER,
+    ))
+    report("cfg.apply_items({})", timeit.timeit(
+        lambda: cfg.apply_items({}), number=NUMBER,
+    ))
+
+
+if __name__ == '__main__':
+    main()
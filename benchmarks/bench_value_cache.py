@@ -0,0 +1,83 @@
+# This file exists within 'config-decorator':
+#
+#   https://github.com/hotoffthehamster/config-decorator
+#
+# Copyright © 2019-2020 Landon Bouma. All rights reserved.
+#
+# Permission is hereby granted,  free of charge,  to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge,  publish,  distribute, sublicense,
+# and/or  sell copies  of the Software,  and to permit persons  to whom the
+# Software  is  furnished  to do so,  subject  to  the following conditions:
+#
+# The  above  copyright  notice  and  this  permission  notice  shall  be
+# included  in  all  copies  or  substantial  portions  of  the  Software.
+#
+# THE  SOFTWARE  IS  PROVIDED  "AS IS",  WITHOUT  WARRANTY  OF ANY KIND,
+# EXPRESS OR IMPLIED,  INCLUDING  BUT NOT LIMITED  TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE  FOR ANY
+# CLAIM,  DAMAGES OR OTHER LIABILITY,  WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE,  ARISING FROM,  OUT OF  OR IN  CONNECTION WITH THE
+# SOFTWARE   OR   THE   USE   OR   OTHER   DEALINGS  IN   THE  SOFTWARE.
+
+
+"""Compares the cost of a hot setting read with and without the value cache.
+
+Run from the project root, e.g.,::
+
+    python -m benchmarks.bench_value_cache
+"""
+
+import timeit
+
+from config_decorator import section
+
+NUMBER = 100000
+
+
+def generate_config():
+    @section(None)
+    class RootSection(object):
+        pass
+
+    @RootSection.section('server')
+    class ServerSection(object):
+        @property
+        @RootSection.setting(
+            "Config-sourced setting.",
+        )
+        def host(self):
+            return 'localhost'
+
+        @property
+        @RootSection.setting(
+            "Default-sourced setting.",
+            choices=[1, 2, 4, 8, 16],
+        )
+        def pool_size(self):
+            return 8
+
+    return RootSection
+
+
+def report(label, seconds):
+    print('{:<32} {:>8.3f} µs/read'.format(label, seconds / NUMBER * 1e6))
+
+
+def main():
+    cfg = generate_config()
+    cfg['server.host'] = 'example.com'
+    for name in ('host', 'pool_size'):
+        ckv = cfg.find_setting(['server', name])
+        # The "before" measurement walks the source chain on every read.
+        before = timeit.timeit(ckv._resolve_value, number=NUMBER)
+        after = timeit.timeit(lambda: ckv.value, number=NUMBER)
+        report('{} (uncached)'.format(name), before)
+        report('{} (cached)'.format(name), after)
+
+
+if __name__ == '__main__':
+    main()
+
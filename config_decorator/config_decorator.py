@@ -141,12 +141,34 @@ example, ``@RootSectionBar.setting`` was used inside ``BarSubsectionBaz``.)
 """
 
 import inspect
-from collections import OrderedDict
+import itertools
+import keyword
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from collections.abc import ItemsView, KeysView, Mapping, ValuesView
+from fnmatch import fnmatchcase
 from functools import update_wrapper
 
 from gettext import gettext as _
 
-from .key_chained_val import KeyChainedValue
+from .key_chained_val import (
+    KeyChainedValue,
+    _MASK_CACHED,
+    _MASK_CLIARG,
+    _MASK_CONFIG,
+    _MASK_FORCED,
+)
+
+# The source layers whose settings the root section keeps track of, by name.
+_FACET_MASKS = {
+    'forced': _MASK_FORCED,
+    'cliarg': _MASK_CLIARG,
+    'config': _MASK_CONFIG,
+}
+
+# Guards starting and stopping the environment pollers (see poll_environ).
+_POLLER_LOCK = threading.Lock()
 
 __all__ = (
     # So that the Sphinx docs do not generate help on the `section`
@@ -210,6 +232,19 @@ class ConfigDecorator(object):
                    (section name ⇒ :class:`ConfigDecorator` object).
         _name: The section name, specified in the decorator,
                or inferred from the class name.
+        _environ: The root section's snapshot of the environment variables
+                  whose names start with the envvar prefix (or ``None`` until
+                  the snapshot is first taken).
+        _envvar_index: The root section's lookup of environment variable name
+                       ⇒ list of
+                       :class:`config_decorator.key_chained_val.KeyChainedValue`
+                       (or ``None`` until first needed). Different settings can
+                       share a name, e.g., "a_b.c" and "a.b_c".
+        _facets: The root section's sets of settings that have a value from
+                  the "forced", "cliarg", and "config" sources, keyed by the
+                  source's mask bit (or ``None`` until first needed).
+        _export_plans: The section's compiled :meth:`as_dict` and
+                       :meth:`apply_items` plans, keyed by export options.
 
     .. DEV: Use `automethod` to document private functions (include them in docs/_build).
     ..
@@ -248,12 +283,46 @@ class ConfigDecorator(object):
         self._innerobj = cls()
 
         self._parent = parent
+        # The root and path are cached when first needed.
+        self._root = None
+        self._path_parts = None
+        self._path_joined = {}
 
         self._kv_cache = OrderedDict()
         self._key_vals = {}
 
         self._sections = OrderedDict()
 
+        self._envvar_prefix = None
+        self._environ = None
+        self._environ_prefix = None
+        self._environ_poller = None
+        self._envvar_index = None
+        self._section_index = None
+        self._setting_index = None
+        self._name_index = None
+        self._facets = None
+        # The root's schema stamp is replaced whenever sections or settings
+        # are added, moved, or removed, so that caches can tell they're stale.
+        self._schema_stamp = object()
+        # The generation is incremented whenever a setting's value might have
+        # changed in this section or its subsections (see handle(), and
+        # materialize()). The root's is also incremented on schema changes.
+        self._generation = 0
+
+        self._asobj = None
+        self._accessor = None
+        self._accessor_stamp = None
+        self._materialized = None
+        self._snapshotted = None
+        self._published = None
+
+        self._export_plans = {}
+        self._export_plans_stamp = None
+
+        self._children_tuples = None
+        self._children_stamp = None
+
         if isinstance(cls_or_name, str):
             self._name = cls_or_name
         else:
@@ -278,34 +347,42 @@ class ConfigDecorator(object):
         # The @decorators run against the parent object.
         # - Fix the settings from the parent cache
         #   to reference this object as the owner.
-        for kval in parent._kv_cache.values():
+        pulled = list(parent._kv_cache.values())
+        for kval in pulled:
             kval._section = self
+            if self._key_vals.get(kval.name, kval) is not kval:
+                # A setting is being redefined, so the old one must be unindexed.
+                self._index_discarded()
         # - Steal its settings cache.
         self._key_vals.update(parent._kv_cache)
         parent._kv_cache = OrderedDict()
         # - Register this object as a section.
         if parent is not self:
             parent._sections[self._name] = self
+            self._forget_paths()
+            # - Add the new section and settings to the root's indexes.
+            self._index_added(sections=[self], keyvals=pulled)
+        else:
+            self._index_added(keyvals=pulled)
 
     # ***
 
     def del_not_persisted(self, config_obj):
         """Removes entries from config_obj without a value from the "config" source.
         """
-        def visitor(condec, keyval):
-            if keyval.persisted:
-                return  # Keep.
-            del condec[keyval]
-
-        self.walk(visitor)
+        for keyval in self.iter_settings(persisted=False):
+            del keyval._section[keyval]
 
     # ***
 
     def find_root(self):
         """Returns the topmost section object, that which has no parent."""
-        if not self._parent:
-            return self
-        return self._parent.find_root()
+        if self._root is None:
+            if self._parent is None:
+                self._root = self
+            else:
+                self._root = self._parent.find_root()
+        return self._root
 
     # ***
 
@@ -316,36 +393,322 @@ class ConfigDecorator(object):
         or was parsed from the command line, or was forceable set by the code,
         calling this method will effectively set the value back to its default.
         """
-        def visitor(condec, keyval):
+        for keyval in self.iter_settings(persisted=True):
             keyval.forget_config_value()
-        self.walk(visitor)
 
     # ***
 
-    def section_path(self, sep=None, _parts=None):
+    @property
+    def envvar_prefix(self):
+        """Returns the prefix used to name the settings' environment variables.
+
+        Each settings configuration (i.e., each root section) has its own
+        prefix. If the prefix was never set, the class-global
+        :attr:`config_decorator.key_chained_val.KeyChainedValue._envvar_prefix`
+        is used.
+        """
+        root = self.find_root()
+        if root._envvar_prefix is None:
+            return KeyChainedValue._envvar_prefix
+        return root._envvar_prefix
+
+    @envvar_prefix.setter
+    def envvar_prefix(self, envvar_prefix):
+        """Sets the envvar prefix for the settings configuration."""
+        root = self.find_root()
+        root._envvar_prefix = envvar_prefix
+        root._reset_environ()
+
+    def refresh_environ(self):
+        """Takes a new snapshot of the environment, used for "envvar" values.
+
+        Settings do not read ``os.environ`` directly. Instead, the root section
+        takes a snapshot of the prefixed environment variables when a value is
+        first resolved, and it reuses that snapshot until this method is called.
+
+        Only settings whose environment variable changed since the previous
+        snapshot are re-resolved.
+        """
+        root = self.find_root()
+        previous = root._environ
+        if previous is None or root._environ_prefix != root.envvar_prefix:
+            root._reset_environ()
+            root._environ_snapshot()
+            return
+        current = root._scan_environ()
+        root._environ = current
+        if previous == current:
+            return
+        changed = set(previous.items()).symmetric_difference(current.items())
+        envvar_index = root._envvar_index_built()
+        for name in envvar_index.keys() & set(name for name, _val in changed):
+            for keyval in envvar_index[name]:
+                keyval._forget_cached()
+
+    def poll_environ(self, interval=None):
+        """Periodically calls :meth:`refresh_environ` from a background timer.
+
+        Values read on other threads are re-resolved after each refresh,
+        but a read that overlaps a refresh may still return the previous
+        value. (The setters are otherwise not synchronized.)
+
+        Args:
+            interval: The number of seconds between refreshes,
+                      or ``None`` to stop polling.
+        """
+        root = self.find_root()
+        with _POLLER_LOCK:
+            if root._environ_poller is not None:
+                root._environ_poller.cancel()
+                root._environ_poller = None
+            if interval:
+                root._start_environ_poller(interval)
+
+    def _start_environ_poller(self, interval):
+        def _poll():
+            self.refresh_environ()
+            with _POLLER_LOCK:
+                # Unless polling was stopped or restarted during the refresh.
+                if self._environ_poller is poller:
+                    self._start_environ_poller(interval)
+
+        poller = threading.Timer(interval, _poll)
+        poller.daemon = True
+        self._environ_poller = poller
+        poller.start()
+
+    def _environ_snapshot(self):
+        root = self.find_root()
+        if root._environ is None:
+            root._environ_prefix = root.envvar_prefix
+            root._environ = root._scan_environ()
+        return root._environ
+
+    def _scan_environ(self):
+        prefix = self._environ_prefix
+        return {
+            name: val for name, val in os.environ.items() if name.startswith(prefix)
+        }
+
+    def _reset_environ(self):
+        self._environ = None
+        self._envvar_index = None
+        self.walk(lambda condec, keyval: keyval._forget_cached())
+
+    # ***
+
+    # The root section maintains lookup indexes for the whole settings tree.
+    # - Each index is built the first time it's needed, and then it's updated
+    #   as sections and settings are added. (If a section is moved or replaced,
+    #   the indexes are discarded, and rebuilt when next needed.)
+
+    def _envvar_index_built(self):
+        if self._envvar_index is None:
+            self._envvar_index = {}
+            self._index_envvars(self._subtree_settings())
+        return self._envvar_index
+
+    def _lookup_indexes_built(self):
+        if self._setting_index is None:
+            self._section_index = {}
+            self._setting_index = {}
+            self._name_index = {}
+            sections, keyvals = self._subtree()
+            self._index_objects(sections, keyvals)
+        return self._section_index, self._setting_index, self._name_index
+
+    def _facets_built(self):
+        if self._facets is None:
+            self._facets = {mask: {} for mask in _FACET_MASKS.values()}
+            self._index_facets(self._subtree_settings())
+        return self._facets
+
+    def _index_facets(self, keyvals):
+        for keyval in keyvals:
+            for mask, facet in self._facets.items():
+                if keyval._val_mask & mask:
+                    facet[keyval] = None
+
+    def _index_envvars(self, keyvals):
+        for keyval in keyvals:
+            self._envvar_index.setdefault(keyval._envvar_name(), []).append(keyval)
+
+    def _index_objects(self, sections, keyvals):
+        for conf_dcor in sections:
+            if conf_dcor._parent is None:
+                # The root section has no name, and is never looked up.
+                continue
+            self._index_name(conf_dcor._name, conf_dcor)
+            path = conf_dcor._indexable_path()
+            if path:
+                self._section_index[path] = conf_dcor
+        for keyval in keyvals:
+            self._index_name(keyval.name, keyval)
+            path = keyval._section._indexable_path(keyval.name)
+            if path:
+                self._setting_index[path] = keyval
+
+    def _index_name(self, name, obj):
+        # Each name maps to all the sections and settings so named, so
+        # that ambiguous names can be detected without searching.
+        objects = self._name_index.setdefault(name, [])
+        if obj not in objects:
+            objects.append(obj)
+
+    def _indexable_path(self, name=None):
+        # Names that contain the separator cannot be found by dotted lookups
+        # (which split on the separator), so they're not indexed.
+        parts = self.section_path(sep=[])
+        if name is not None:
+            parts.append(name)
+        if not parts or any(self.SEP in part for part in parts):
+            return None
+        return self.SEP.join(parts)
+
+    def _subtree(self):
+        sections = []
+        keyvals = []
+
+        def _visit(conf_dcor):
+            sections.append(conf_dcor)
+            keyvals.extend(conf_dcor._key_vals.values())
+            for sub_dcor in conf_dcor._sections.values():
+                _visit(sub_dcor)
+
+        _visit(self)
+        return sections, keyvals
+
+    def _subtree_settings(self):
+        return self._subtree()[1]
+
+    def _index_added(self, sections=(), keyvals=()):
+        """Adds sections and settings to the root section's lookup indexes, if built."""
+        root = self.find_root()
+        root._schema_stamp = object()
+        root._generation += 1
+        if root._envvar_index is not None:
+            root._index_envvars(keyvals)
+        if root._setting_index is not None:
+            root._index_objects(sections, keyvals)
+        if root._facets is not None:
+            root._index_facets(keyvals)
+
+    def _index_removed(self, keyval):
+        """Removes a setting from the root section's lookup indexes, if built."""
+        root = self.find_root()
+        root._schema_stamp = object()
+        root._generation += 1
+        if root._envvar_index is not None:
+            keyvals = root._envvar_index.get(keyval._envvar_name(), [])
+            if keyval in keyvals:
+                keyvals.remove(keyval)
+        if root._setting_index is not None:
+            path = self._indexable_path(keyval.name)
+            if path:
+                root._setting_index.pop(path, None)
+            objects = root._name_index.get(keyval.name, [])
+            if keyval in objects:
+                objects.remove(keyval)
+        if root._facets is not None:
+            for facet in root._facets.values():
+                facet.pop(keyval, None)
+
+    def _index_discarded(self):
+        """Discards the root section's lookup indexes, e.g., after a section moves."""
+        root = self.find_root()
+        root._schema_stamp = object()
+        root._generation += 1
+        root._envvar_index = None
+        root._section_index = None
+        root._setting_index = None
+        root._name_index = None
+        root._facets = None
+
+    def _indexed_objects(self, path, skip_sections=False):
+        """Returns the section and/or setting at the path relative to this section."""
+        root = self.find_root()
+        section_index, setting_index, _name_index = root._lookup_indexes_built()
+        if self is not root:
+            prefix = self._indexable_path()
+            if prefix is None:
+                # This section's own path is not indexed (a name contains
+                # the separator), and probing with it could find another
+                # section's object, so let the caller walk the tree instead.
+                return []
+            path = prefix + self.SEP + path
+        objects = []
+        if not skip_sections and path in section_index:
+            objects.append(section_index[path])
+        if path in setting_index:
+            objects.append(setting_index[path])
+        return objects
+
+    def _named_objects(self, name, skip_sections=False):
+        """Returns the sections and settings with the given name, in any order."""
+        root = self.find_root()
+        name_index = root._lookup_indexes_built()[2]
+        objects = name_index.get(name, [])
+        if self is not root:
+            objects = [obj for obj in objects if self._contains(obj)]
+        if skip_sections:
+            objects = [obj for obj in objects if isinstance(obj, KeyChainedValue)]
+        return list(objects)
+
+    def _contains(self, obj):
+        if isinstance(obj, KeyChainedValue):
+            container = obj._section
+        else:
+            container = obj._parent
+        while container is not None:
+            if container is self:
+                return True
+            container = container._parent
+        return False
+
+    # ***
+
+    def section_path(self, sep=None):
         """Returns a flattened canonicalized representation of the complete section path.
 
         Args:
             sep: The separator character to use, defaults to ConfigDecorator.SEP.
-            _parts: Used internally on recursive calls to this function.
+                 Or use ``[]`` to return a list of the section names instead.
 
         Returns:
             The "path" to this section, as derived from the name of the root
             section on downward to this section, using the separator character
             between each successive section's name.
+
+        The path is cached (once for each separator used), and the cache
+        is cleared if the section (or one of its ancestors) is moved.
         """
-        if _parts is None:
-            _parts = []
+        if sep == []:
+            return list(self._section_path_parts())
         if sep is None:
             sep = self.SEP
-        # Ignore the root element. Start with its sections.
-        if self._parent is None:
-            if sep == []:
-                return _parts
+        try:
+            return self._path_joined[sep]
+        except KeyError:
+            joined = sep.join(self._section_path_parts())
+            self._path_joined[sep] = joined
+            return joined
+
+    def _section_path_parts(self):
+        if self._path_parts is None:
+            # Ignore the root element. Start with its sections.
+            if self._parent is None:
+                self._path_parts = ()
             else:
-                return sep.join(_parts)
-        _parts.insert(0, self._name)
-        return self._parent.section_path(sep, _parts)
+                self._path_parts = self._parent._section_path_parts() + (self._name,)
+        return self._path_parts
+
+    def _forget_paths(self):
+        """Clears the cached root and paths of this section and its subsections."""
+        self._root = None
+        self._path_parts = None
+        self._path_joined = {}
+        for conf_dcor in self._sections.values():
+            conf_dcor._forget_paths()
 
     # ***
 
@@ -358,15 +721,142 @@ class ConfigDecorator(object):
                      and a reference to the
                      :class:`config_decorator.key_chained_val.KeyChainedValue` object.
         """
-        # NOTE: For del_not_persisted to work, convert values() iterator to list,
-        #       so that items can be deleted from the dictionary. (lb): I'd guess
-        #       the only "hit" we take is needing to store the items in memory;
-        #       otherwise performance should be the same... not that you'd notice
-        #       with a simple config structure, though.
-        for keyval in list(self._key_vals.values()):
-            visitor(self, keyval)
-        for conf_dcor in list(self._sections.values()):
-            conf_dcor.walk(visitor)
+        # The visitor may delete the setting it's passed (see iter_settings).
+        for keyval in self.iter_settings():
+            visitor(keyval._section, keyval)
+
+    def iter_settings(
+        self,
+        persisted=None,
+        source=None,
+        ephemeral=None,
+        hidden=None,
+        under=None,
+    ):
+        """Yields every matching setting in this section and its subsections.
+
+        The settings are visited in the same order as :meth:`walk`, i.e.,
+        each section's settings, and then its subsections, depth-first.
+
+        Settings can be deleted while iterating (and settings added during
+        iteration may or may not be visited).
+
+        When filtering by ``persisted=True``, or by the "forced", "cliarg",
+        "config", or "envvar" ``source``, only the sections that contain
+        such settings are visited (see :meth:`_facet_settings`).
+
+        Args:
+            persisted: If not None, yield only settings whose
+                       :meth:`config_decorator.key_chained_val.KeyChainedValue.persisted`
+                       state is the same.
+            source: If set, yield only settings whose value is from the named
+                    source (see
+                    :meth:`config_decorator.key_chained_val.KeyChainedValue.source`).
+            ephemeral: If not None, yield only settings with the same ephemeral state.
+            hidden: If not None, yield only settings with the same hidden state.
+            under: A section, or the dotted path to a section (relative to this
+                   section), to start from, instead of this section.
+        """
+        start = self._find_section(under)
+        if source is not None:
+            candidates = start._facet_settings(source)
+        elif persisted:
+            candidates = start._facet_settings('config')
+        else:
+            candidates = None
+        visit = None
+        if candidates is not None:
+            visit = start._sections_holding(candidates)
+        stack = [start]
+        while stack:
+            conf_dcor = stack.pop()
+            keyvals, sections = conf_dcor._children()
+            key_vals = conf_dcor._key_vals
+            for keyval in keyvals:
+                if key_vals.get(keyval._name) is not keyval:
+                    # Deleted since the section's children were listed.
+                    continue
+                if candidates is not None and keyval not in candidates:
+                    continue
+                if persisted is not None and keyval.persisted != persisted:
+                    continue
+                if ephemeral is not None and bool(keyval.ephemeral) != ephemeral:
+                    continue
+                if hidden is not None and bool(keyval.hidden) != hidden:
+                    continue
+                if source is not None and keyval.source != source:
+                    continue
+                yield keyval
+            if visit is None:
+                stack.extend(reversed(sections))
+            else:
+                stack.extend(sub for sub in reversed(sections) if sub in visit)
+
+    def _facet_settings(self, source):
+        """Returns the settings that have a value from the named source, or None.
+
+        The root section keeps the "forced", "cliarg", and "config" sets
+        up to date as the settings' source values are set and forgotten.
+        The "envvar" settings are found from the environment snapshot.
+        Otherwise, for the "default" source, returns None.
+
+        The returned collection includes settings from the whole settings
+        configuration, and some of them may have a value from a higher
+        priority source, too.
+        """
+        root = self.find_root()
+        try:
+            mask = _FACET_MASKS[source]
+        except KeyError:
+            if source != 'envvar':
+                return None
+            envvar_index = root._envvar_index_built()
+            return {
+                keyval: None
+                for name in root._environ_snapshot()
+                for keyval in envvar_index.get(name, ())
+            }
+        return root._facets_built()[mask]
+
+    def _sections_holding(self, keyvals):
+        """Returns the set of subsections that contain any of the given settings."""
+        holding = set()
+        for keyval in keyvals:
+            conf_dcor = keyval._section
+            while (
+                conf_dcor is not None
+                and conf_dcor is not self
+                and conf_dcor not in holding
+            ):
+                holding.add(conf_dcor)
+                conf_dcor = conf_dcor._parent
+        return holding
+
+    def _find_section(self, section=None):
+        """Returns the section, or the section at the path relative to this one."""
+        if section is None:
+            return self
+        if isinstance(section, ConfigDecorator):
+            return section
+        found = self._find_one_object(section, KeyError)
+        if not isinstance(found, ConfigDecorator):
+            raise KeyError(_('Not a section: “{}”').format(section))
+        return found
+
+    def _children(self):
+        """Returns this section's settings and subsections, as tuples.
+
+        The tuples are cached until the schema changes, so callers
+        can iterate over them while settings are deleted.
+        """
+        stamp = self.find_root()._schema_stamp
+        if self._children_stamp is not stamp:
+            self._children_tuples = (
+                tuple(self._key_vals.values()),
+                tuple(self._sections.values()),
+            )
+            self._children_stamp = stamp
+        return self._children_tuples
 
     # ***
 
@@ -387,6 +877,40 @@ class ConfigDecorator(object):
         kwargs.setdefault('unmutated', True)
         return self._prepare_dict(config, **kwargs)
 
+    def as_flat_dict(self, **kwargs):
+        """Returns a new flat dict of dotted setting paths ⇒ settings values.
+
+        Args: Same as for _prepare_dict(), except ``keep_empties`` is not used.
+        """
+        return dict(self.iter_flat(**kwargs))
+
+    def iter_flat(self, keep_empties=False, **kwargs):
+        """Yields a (dotted setting path, setting value) pair for each setting.
+
+        The settings are visited in the same order as :meth:`as_dict`,
+        and the paths are relative to this section.
+
+        Args: Same as for _prepare_dict(), except ``keep_empties`` is not used.
+        """
+        sep = self.SEP
+        for parts, value, _source in self.iter_export(**kwargs):
+            yield sep.join(parts), value
+
+    def iter_export(self, keep_empties=False, **kwargs):
+        """Yields a (section path tuple, setting value, source name) for each setting.
+
+        The settings are visited depth-first in definition order, the same
+        as :meth:`as_dict`, without building a dict of the settings. The
+        path tuple ends with the setting name, and it's relative to this
+        section. The source name is the value's source, e.g., 'default'
+        or 'config' (see
+        :meth:`config_decorator.key_chained_val.KeyChainedValue.source`).
+
+        Args: Same as for _prepare_dict(), except ``keep_empties`` is not used.
+        """
+        options = self._export_options(**kwargs)
+        return self._export_plan(options).walk(visit=self._export_visit(options))
+
     def _prepare_dict(
         self,
         config,
@@ -407,70 +931,63 @@ class ConfigDecorator(object):
                         set from the "config" source.
             use_defaults: Set True to use the default value for every setting.
             unmutated: Set True to use the original config values when possible.
+            keep_empties: Set True to add this section's subsections to the
+                          dict even when they have no settings to add.
 
         Returns:
             The number of settings updated or added to the "config" dict.
         """
-        def _prepare_items():
-            n_settings = 0
-            for section, conf_dcor in self._sections.items():
-                n_settings += _recurse_section(section, conf_dcor)
-            for name, ckv in self._key_vals.items():
-                if (
-                    (ckv.ephemeral and not add_ephemeral)
-                    or (ckv.hidden and not add_hidden)
-                ):
-                    continue
-                try:
-                    config[name] = choose_default_or_confval(ckv)
-                    n_settings += 1
-                except AttributeError:
-                    pass
-            return n_settings
-
-        def _recurse_section(section, conf_dcor):
-            existed = section in config
-            subsect = config.setdefault(section, {})
-            n_settings = conf_dcor.apply_items(
-                subsect,
-                add_ephemeral=add_ephemeral,
-                add_hidden=add_hidden,
-                skip_unset=skip_unset,
-                use_defaults=use_defaults,
-                unmutated=unmutated,
-            )
-            if not n_settings and not existed and not keep_empties:
-                del config[section]
-            return n_settings
-
-        def choose_default_or_confval(ckv):
-            if skip_unset and not ckv.persisted:
-                # This includes ckv.ephemeral.
-                raise AttributeError()
-            if (
-                (use_defaults or not ckv.persisted)
-                and (add_hidden or not ckv.hidden)
-            ):
-                if not unmutated:
-                    # ckv.default is the non-conformed input value;
-                    # we want the value after it's been internalized.
-                    return ckv.value_from_default
-                else:
-                    return ckv.default
-            if unmutated:
-                return ckv.value_unmutated
-            if ckv.ephemeral:
-                # The calculated (ephemeral) value is defined with the ckv
-                # method itself (and not the @settings decorator), which is
-                # accessed through the 'default' value, which will be the
-                # fall-through case for the broader value() method. Note that
-                # `ckv.value` here is essentially `ckv._typify(ckv.default)`.
-                return ckv.value
-            if not use_defaults and ckv.persisted:
-                return ckv.value_from_config
-            raise AttributeError()
+        options = self._export_options(
+            add_ephemeral=add_ephemeral,
+            add_hidden=add_hidden,
+            skip_unset=skip_unset,
+            use_defaults=use_defaults,
+            unmutated=unmutated,
+        )
+        visit = self._export_visit(options)
+        return self._export_plan(options).export(config, keep_empties, visit)
+
+    @staticmethod
+    def _export_options(
+        add_ephemeral=False,
+        add_hidden=False,
+        skip_unset=False,
+        use_defaults=False,
+        unmutated=False,
+    ):
+        """Returns the export options as a tuple, for use as a plan cache key."""
+        return (
+            bool(add_ephemeral),
+            bool(add_hidden),
+            bool(skip_unset),
+            bool(use_defaults),
+            bool(unmutated),
+        )
+
+    def _export_visit(self, options):
+        """Returns the subsections an export must visit, or None to visit them all.
+        """
+        skip_unset = options[2]
+        if not skip_unset:
+            return None
+        # Only persisted settings are exported, so skip the other sections.
+        return self._sections_holding(self._facet_settings('config'))
 
-        return _prepare_items()
+    def _export_plan(self, options):
+        """Returns the section's compiled export plan for the given options.
+
+        Plans are cached per options tuple until the schema changes.
+        """
+        stamp = self.find_root()._schema_stamp
+        if self._export_plans_stamp is not stamp:
+            self._export_plans = {}
+            self._export_plans_stamp = stamp
+        try:
+            return self._export_plans[options]
+        except KeyError:
+            plan = _ExportPlan(self, options)
+            self._export_plans[options] = plan
+            return plan
 
     # ***
 
@@ -514,6 +1031,161 @@ class ConfigDecorator(object):
 
     # ***
 
+    def update_flat(self, config, errors_ok=False, unknown=None):
+        """Updates existing settings values from dotted setting paths.
+
+        Unlike :meth:`update_known`, which descends a nested dict, this
+        method looks up each path directly, and it does not build a copy
+        of the input, so it can consume a long iterator of pairs.
+
+        Args:
+            config: A dict of dotted setting paths (relative to this section)
+                    ⇒ values, or an iterable of (dotted path, value) pairs.
+            errors_ok: Set True to collect validation errors rather than
+                       raising on the first one.
+            unknown: An optional function, called with each (path, value)
+                     that does not correspond to a known (non-ephemeral)
+                     setting. If not set, unknown paths are ignored.
+
+        Returns:
+            A dict of dotted path ⇒ error message for each value that
+            failed validation (which is always empty unless ``errors_ok``).
+        """
+        try:
+            items = config.items()
+        except AttributeError:
+            items = config
+        find_setting = self._setting_finder()
+        error_messages = {}
+        for path, value in items:
+            ckv = find_setting(path)
+            if ckv is None or ckv.ephemeral:
+                if unknown is not None:
+                    unknown(path, value)
+                continue
+            try:
+                ckv.value = value
+            except ValueError as err:
+                if not errors_ok:
+                    raise
+                error_messages[path] = str(err)
+        return error_messages
+
+    def get_many(self, paths):
+        """Returns a dict of the settings values at the given paths.
+
+        Args:
+            paths: An iterable of dotted setting paths, relative to this section.
+
+        Returns:
+            A new dict of path ⇒ setting value.
+
+        Raises:
+            KeyError: If any path is not a known setting. The error lists
+                      every unknown path, not just the first one found.
+        """
+        find_setting = self._setting_finder()
+        values = {}
+        unknown = []
+        for path in paths:
+            ckv = find_setting(path)
+            if ckv is None:
+                unknown.append(path)
+            else:
+                values[path] = ckv.value
+        if unknown:
+            raise KeyError(
+                _('Unknown settings: {}').format(
+                    ', '.join('“{}”'.format(path) for path in unknown)
+                )
+            )
+        return values
+
+    def set_many(self, config, source='config', errors_ok=False):
+        """Sets the settings values at the given paths, all or nothing.
+
+        Every value is conformed and validated before any value is set,
+        and all of the errors are collected, rather than stopping at the
+        first one.
+
+        Args:
+            config: A dict of dotted setting paths (relative to this section)
+                    ⇒ values, or an iterable of (dotted path, value) pairs.
+            source: The source to set: "config", "cliarg", or "forced".
+            errors_ok: If False, no values are set if there are any errors.
+                       If True, the valid values are set regardless.
+
+        Returns:
+            A dict of dotted path ⇒ error message for each value that
+            was not set, either because its path is not a known setting,
+            or because the value failed validation.
+
+        Raises:
+            ValueError: If there are any errors and not ``errors_ok``.
+                        The error lists every error message.
+        """
+        # Only the "config" setter needs the original value (for value_unmutated).
+        setters = {
+            'config': KeyChainedValue._set_config,
+            'cliarg': lambda ckv, value, _orig_value: ckv._set_cliarg(value),
+            'forced': lambda ckv, value, _orig_value: ckv._set_forced(value),
+        }
+        try:
+            setter = setters[source]
+        except KeyError:
+            raise ValueError(_('Cannot set values from source: “{}”').format(source))
+        try:
+            items = config.items()
+        except AttributeError:
+            items = config
+        find_setting = self._setting_finder()
+        conformed = []
+        error_messages = {}
+        for path, value in items:
+            ckv = find_setting(path)
+            if ckv is None:
+                error_messages[path] = _('Unknown setting: “{}”').format(path)
+                continue
+            try:
+                conformed.append((ckv, ckv._value_conform_and_validate(value), value))
+            except ValueError as err:
+                error_messages[path] = str(err)
+        if error_messages and not errors_ok:
+            raise ValueError('\n'.join(error_messages.values()))
+        for ckv, value, orig_value in conformed:
+            setter(ckv, value, orig_value)
+        return error_messages
+
+    def _setting_finder(self):
+        """Returns a function that finds a setting by its dotted path, or returns None.
+
+        The path is relative to this section. Setting and section names
+        that contain the separator cannot be found this way.
+        """
+        root = self.find_root()
+        setting_index = root._lookup_indexes_built()[1]
+        if self is root:
+            return setting_index.get
+        prefix = self._indexable_path()
+        if prefix is None:
+            # Not indexed (see _indexed_objects), so walk the sections.
+            def find_setting(path):
+                parts = path.split(self.SEP)
+                conf_dcor = self
+                for name in parts[:-1]:
+                    conf_dcor = conf_dcor._sections.get(name)
+                    if conf_dcor is None:
+                        return None
+                return conf_dcor._key_vals.get(parts[-1])
+
+            return find_setting
+        prefix += self.SEP
+
+        def find_setting(path):
+            return setting_index.get(prefix + path)
+
+        return find_setting
+
     def update_gross(self, other):
         """Consumes all values from a dict, creating new sections and settings as necessary.
 
@@ -615,10 +1287,11 @@ class ConfigDecorator(object):
                 name=setting_name,
                 default_f=lambda x: '',
                 doc=_('Created by `setdefault`'),
-                section=self,
+                section=conf_dcor,
             )
             ckv.value = setting_value
-            self._key_vals[ckv.name] = ckv
+            conf_dcor._key_vals[ckv.name] = ckv
+            conf_dcor._index_added(keyvals=[ckv])
             return setting_value
 
         return _setdefault()
@@ -642,25 +1315,68 @@ class ConfigDecorator(object):
 
         # NOTE: This method is clobbery.
         """
+        if sub_dcor._parent is not None:
+            sub_dcor._index_discarded()
+        if self._sections.get(section_name, sub_dcor) is not sub_dcor:
+            self._index_discarded()
         self._sections[section_name] = sub_dcor
         sub_dcor._parent = self
+        sub_dcor._forget_paths()
+        sections, keyvals = sub_dcor._subtree()
+        for keyval in keyvals:
+            # The values may have been resolved using another root's environ.
+            keyval._forget_cached()
+        self._index_added(sections=sections, keyvals=keyvals)
 
     # ***
 
     def keys(self):
-        """Returns a list of the top-level section and settings names.
+        """Returns a live view of the top-level section and settings names.
         """
-        return self.as_dict().keys()
+        return KeysView(self)
 
     def values(self):
-        """Returns a list of sub-section branches and top-level settings values.
+        """Returns a live view of the subsections and top-level settings values.
+
+        Setting values are not resolved until the view is iterated.
         """
-        return self.as_dict().values()
+        return _SectionValuesView(self)
 
     def items(self):
-        """Returns dict of section names → subsections, and setting names → values.
+        """Returns a live view of section names → subsections, setting names → values.
+
+        Setting values are not resolved until the view is iterated.
+        """
+        return _SectionItemsView(self)
+
+    def get(self, name, default=None):
+        """Returns the section or setting value for ``name``, or ``default`` if unknown.
+
+        Uses the same lookup as ``obj['key']``.
         """
-        return self.as_dict().items()
+        try:
+            return self[name]
+        except (AttributeError, KeyError):
+            return default
+
+    def __contains__(self, name):
+        return name in self._sections or name in self._key_vals
+
+    def __iter__(self):
+        # Like as_dict(), list subsections before settings.
+        yield from self._sections
+        yield from self._key_vals
+
+    def __len__(self):
+        return len(self._sections) + len(self._key_vals)
+
+    def _child_value(self, name):
+        """Returns the named subsection, or the named setting's value (not a search).
+        """
+        try:
+            return self._sections[name]
+        except KeyError:
+            return self._key_vals[name].value
 
     # ***
 
@@ -697,11 +1413,20 @@ class ConfigDecorator(object):
                 return [self]
             elif len(parts) == 1:
                 name = parts[0]
-                objects = self._find_objects_named(name, skip_sections)
+                objects = self._named_objects(name, skip_sections)
+                if len(objects) > 1:
+                    # Search the tree to return the matches in breadth-first order.
+                    objects = self._find_objects_named(name, skip_sections)
                 # Behave same as when len(parts) > 1, and raise on missing.
                 if not objects:
                     raise KeyError(name)
             else:
+                if not any(self.SEP in part for part in parts):
+                    objects = self._indexed_objects(self.SEP.join(parts), skip_sections)
+                    if objects:
+                        return objects
+                # Not indexed, so walk the sections (and raise KeyError if
+                # one of the sections is not found).
                 section_names = parts[:-1]
                 object_name = parts[-1]
 
@@ -733,6 +1458,101 @@ class ConfigDecorator(object):
             objects.extend(conf_dcor._find_objects_named(name, skip_sections))
         return objects
 
+    def iter_matching(self, pattern, limit=None):
+        """Yields the settings whose paths, relative to this section, match the pattern.
+
+        Args:
+            pattern: A glob, or a compiled regular expression.
+
+                     A glob is split on the section separator, and each part
+                     is matched against one section or setting name, using
+                     :func:`fnmatch.fnmatchcase` (so ``*``, ``?``, and ``[seq]``
+                     work as usual). A part that's just ``**`` matches zero
+                     or more sections. E.g., ``'logging.**'`` matches every
+                     setting under the "logging" section, and ``'**.timeout'``
+                     matches every "timeout" setting.
+
+                     Parts without wildcards are looked up directly, so only
+                     the sections the glob can match are visited.
+
+                     A compiled regular expression is searched for in the
+                     dotted path of every setting.
+
+            limit: The maximum number of settings to yield, if not None.
+                   Each setting is yielded (and counted) at most once.
+
+        Returns:
+            An iterator of the matching settings, in the same order as
+            :meth:`walk`. Settings are found as the iterator is consumed.
+        """
+        if isinstance(pattern, str):
+            parts = []
+            for part in pattern.split(self.SEP):
+                if part != '**' or not parts or parts[-1] != '**':
+                    parts.append(part)
+            matches = self._glob_settings(parts)
+            if parts.count('**') > 1:
+                # Each ** can match a setting by a different route, e.g.,
+                # '**.a.**' matches 'a.a.b' via either 'a'.
+                matches = self._distinct_settings(matches)
+        else:
+            matches = self._regex_settings(pattern)
+        if limit is not None:
+            matches = itertools.islice(matches, limit)
+        return matches
+
+    @staticmethod
+    def _distinct_settings(keyvals):
+        seen = set()
+        for keyval in keyvals:
+            if keyval not in seen:
+                seen.add(keyval)
+                yield keyval
+
+    def _glob_settings(self, parts):
+        part, rest = parts[0], parts[1:]
+        keyvals, sections = self._children()
+        if part == '**':
+            if rest:
+                yield from self._glob_settings(rest)
+            else:
+                for keyval in keyvals:
+                    if self._key_vals.get(keyval._name) is keyval:
+                        yield keyval
+            for conf_dcor in sections:
+                yield from conf_dcor._glob_settings(parts)
+        elif not any(char in part for char in '*?['):
+            if not rest:
+                keyval = self._key_vals.get(part)
+                if keyval is not None:
+                    yield keyval
+            elif part in self._sections:
+                yield from self._sections[part]._glob_settings(rest)
+        elif not rest:
+            for keyval in keyvals:
+                if (
+                    fnmatchcase(keyval._name, part)
+                    and self._key_vals.get(keyval._name) is keyval
+                ):
+                    yield keyval
+        else:
+            for conf_dcor in sections:
+                if fnmatchcase(conf_dcor._name, part):
+                    yield from conf_dcor._glob_settings(rest)
+
+    def _regex_settings(self, regex):
+        sep = self.SEP
+        prefix = self.section_path()
+        skip = len(prefix) + len(sep) if prefix else 0
+        for keyval in self.iter_settings():
+            section_path = keyval._section.section_path()
+            if section_path:
+                path = section_path + sep + keyval._name
+            else:
+                path = keyval._name
+            if regex.search(path[skip:]):
+                yield keyval
+
     def find_setting(self, parts):
         """Returns the setting with the given path and name.
 
@@ -749,6 +1569,168 @@ class ConfigDecorator(object):
 
     # ***
 
+    def compile_accessors(self):
+        """Returns an object for fast dot-notation reads of this section's settings.
+
+        The object's class is generated from the section's current schema,
+        with a property for each setting, which returns the setting value,
+        and an attribute for each subsection, which references the
+        subsection's own accessor object. E.g., ``acc.foo.bar`` returns the
+        value of the "foo.bar" setting, without searching for it by name
+        (like :attr:`asobj` does).
+
+        The generated classes are cached, and they're only generated again
+        after the schema changes. Accessors from before a schema change
+        still reference the settings as they were, so call this method
+        again to pick up new sections and settings.
+
+        An accessor's ``_`` attribute references its section.
+        """
+        stamp = self.find_root()._schema_stamp
+        if self._accessor_stamp is not stamp:
+            self._accessor = _compile_accessor(self)
+            self._accessor_stamp = stamp
+        return self._accessor
+
+    def materialize(self):
+        """Returns an immutable copy of the section's settings values, as namedtuples.
+
+        Each section is represented by a namedtuple with a field for each
+        subsection (another namedtuple), and then a field for each setting
+        value. Names that are not valid identifiers are changed: characters
+        other than letters, digits, and underscores are replaced with
+        underscores, e.g., ``kick-out-the-jams`` ⇒ ``kick_out_the_jams``,
+        and names that still aren't valid are renamed positionally
+        (see :func:`collections.namedtuple` ``rename``). List, set, and dict
+        values are copied as tuples, frozensets, and tuples of items, like
+        :meth:`snapshot` does, so the result cannot be used to change the
+        settings values.
+
+        The result is cached. After settings values change, only the
+        namedtuples for the sections with changes, and their ancestors,
+        are made again; the namedtuples of the unchanged subsections are
+        reused. So comparing two results' subsections by identity (``is``)
+        cheaply tells what might have changed. (Settings with dynamic
+        defaults are read anew each time, so their sections are never reused.)
+        """
+        return self._materialize()[0]
+
+    def _materialize(self):
+        """Returns the section's namedtuple, and whether it can be reused later."""
+        stamp = self.find_root()._schema_stamp
+        cached = self._materialized
+        if cached is not None and cached[0] is stamp and cached[1] == self._generation:
+            return cached[2], True
+        if cached is not None and cached[0] is stamp:
+            cls = type(cached[2])
+        else:
+            cls = _materialized_class(self)
+        generation = self._generation
+        reusable = True
+        values = []
+        for conf_dcor in self._sections.values():
+            value, sub_reusable = conf_dcor._materialize()
+            values.append(value)
+            reusable = reusable and sub_reusable
+        for keyval in self._key_vals.values():
+            values.append(_frozen(keyval.value))
+            # The value is not cached if it's a dynamic (or mutable) default.
+            reusable = reusable and bool(keyval._val_mask & _MASK_CACHED)
+        materialized = cls._make(values)
+        if reusable:
+            self._materialized = (stamp, generation, materialized)
+        else:
+            # Remember the class, but not the values.
+            self._materialized = (stamp, None, materialized)
+        return materialized, reusable
+
+    def snapshot(self):
+        """Returns an immutable, hashable copy of the section's settings values.
+
+        The snapshot is a read-only mapping of subsection names to
+        subsection snapshots, and of setting names to setting values,
+        which can also be indexed by dotted path, e.g., ``snap['foo.bar']``.
+        List, set, and dict values are copied as tuples, frozensets, and
+        tuples of items, respectively, so that snapshots are hashable.
+
+        Like :meth:`materialize`, snapshots of unchanged subsections are
+        reused, so making a new snapshot after a change only copies the
+        sections that changed (and their ancestors).
+
+        Making a snapshot reads the settings configuration, so it must not
+        race with changes to the same. To share settings with other threads,
+        see :meth:`publish`.
+        """
+        return self._snapshot()[0]
+
+    def _snapshot(self):
+        """Returns the section's snapshot, and whether it can be reused later."""
+        stamp = self.find_root()._schema_stamp
+        cached = self._snapshotted
+        if cached is not None and cached[0] is stamp and cached[1] == self._generation:
+            return cached[2], True
+        generation = self._generation
+        reusable = True
+        sections = {}
+        for name, conf_dcor in self._sections.items():
+            sections[name], sub_reusable = conf_dcor._snapshot()
+            reusable = reusable and sub_reusable
+        values = {}
+        for name, keyval in self._key_vals.items():
+            values[name] = _frozen(keyval.value)
+            # The value is not cached if it's a dynamic (or mutable) default.
+            reusable = reusable and bool(keyval._val_mask & _MASK_CACHED)
+        snap = _SectionSnapshot(sections, values, self.SEP)
+        self._snapshotted = (stamp, generation, snap) if reusable else None
+        return snap, reusable
+
+    def publish(self):
+        """Makes a snapshot of the whole settings configuration, and publishes it.
+
+        The root section's :attr:`published` snapshot is replaced by the new
+        snapshot with a single reference assignment, so readers in other
+        threads never block, and never see a partially updated configuration.
+        Readers that already hold the previous snapshot keep using it.
+
+        The thread that changes settings should call this method when it's
+        done making a set of changes (e.g., after :meth:`update_known`).
+
+        Returns:
+            The new snapshot.
+        """
+        root = self.find_root()
+        snap = root.snapshot()
+        root._published = snap
+        return snap
+
+    @property
+    def published(self):
+        """Returns the last snapshot published by :meth:`publish` (or ``None``).
+
+        This is the whole configuration's snapshot, even for a subsection.
+        """
+        return self.find_root()._published
+
+    def handle(self, path):
+        """Returns a handle for fast, repeated reads of the setting at the given path.
+
+        The handle references the setting directly, and it remembers the
+        setting's last value. Reading ``handle.value`` only resolves the
+        value again after the settings configuration changes (as tracked
+        by the root section's generation counter). Setting the handle's
+        value is the same as setting the setting's value.
+
+        Args:
+            path: The setting name or dotted path, as used with ``obj['key']``.
+
+        Raises:
+            KeyError: If the path is not a (single) known setting.
+        """
+        keyval = self._find_one_object(path, KeyError)
+        if not isinstance(keyval, KeyChainedValue):
+            raise KeyError(_('Not a setting: “{}”').format(path))
+        return _SettingHandle(keyval)
+
     @property
     def asobj(self):
         """Returns a representation of the section that can be accessed like an object.
@@ -760,25 +1742,21 @@ class ConfigDecorator(object):
 
             The object also has a magic ``_`` method, if you want to use dot-notation
             to get at a subsection, but then want access to the actual section object.
-        """
-        class anyobj(object):
-            def __getattr__(_self, name):
-                # See also:
-                #   return super(ConfigDecorator, self).__getattribute__(name)
-                return self._find_one_object(name, AttributeError, asobj=True)
 
-            @property
-            def _(_self):
-                """A wonky get-out-of-jail-free card, or reference to the section.
-                """
-                return self
-        return anyobj()
+            The same object is returned on every call, and it remembers the
+            objects it finds, until the settings configuration is changed.
+        """
+        if self._asobj is None:
+            self._asobj = _SectionProxy(self)
+        return self._asobj
 
     def __delitem__(self, name_or_keyval):
         try:
             name = name_or_keyval.name
         except AttributeError:
             name = name_or_keyval
+        keyval = self._key_vals[name]
+        self._index_removed(keyval)
         del self._key_vals[name]
 
     def __getitem__(self, name):
@@ -816,12 +1794,16 @@ class ConfigDecorator(object):
         self._find_one_object(name, KeyError).value = value
 
     def _find_one_object(self, name, error_cls, asobj=False):
-        parts = name.split(self.SEP)
-        if len(parts) > 1:
+        if self.SEP in name:
             # User looked up, e.g., config['section1.section2....key'].
-            objects = self.find_all(parts)
+            objects = self._indexed_objects(name) or self.find_all(name.split(self.SEP))
         else:
-            objects = self._find_objects_named(name)
+            # Prefer a direct child, so that obj['key'] agrees with ``in`` and
+            # iteration, then fall back to searching the whole subtree.
+            objects = [
+                found for found in (self._sections.get(name), self._key_vals.get(name))
+                if found is not None
+            ] or self._named_objects(name)
         if len(objects) > 1:
             raise error_cls(
                 _('More than one config object named: “{}”').format(name)
@@ -914,6 +1896,7 @@ class ConfigDecorator(object):
         """Creates a new ConfigDecorator as root of the passed instance.
         """
         section_cdec._name = section_name
+        section_cdec._forget_paths()
         condec = ConfigDecorator(object, cls_or_name='', parent=None)
         condec.set_section(section_name, section_cdec)
         return condec
@@ -921,6 +1904,376 @@ class ConfigDecorator(object):
     # ***
 
 
+class _SectionProxy(object):
+    """Provides dot-notation access to a section's subsections and settings.
+
+    Use :attr:`ConfigDecorator.asobj` to get the section's proxy object.
+    """
+
+    __slots__ = ('_asobj_section', '_asobj_found', '_asobj_stamp')
+
+    def __init__(self, section):
+        self._asobj_section = section
+        self._asobj_found = {}
+        self._asobj_stamp = None
+
+    def __getattr__(self, name):
+        if name.startswith('_asobj_') or (name.startswith('__') and name.endswith('__')):
+            # E.g., copy and pickle make the object without calling __init__,
+            # then look for __setstate__, before the slots are set.
+            raise AttributeError(name)
+        section = self._asobj_section
+        stamp = section.find_root()._schema_stamp
+        if self._asobj_stamp is not stamp:
+            self._asobj_found = {}
+            self._asobj_stamp = stamp
+        try:
+            return self._asobj_found[name]
+        except KeyError:
+            found = section._find_one_object(name, AttributeError, asobj=True)
+            self._asobj_found[name] = found
+            return found
+
+    @property
+    def _(self):
+        """A wonky get-out-of-jail-free card, or reference to the section.
+        """
+        return self._asobj_section
+
+
+_SKIP = object()
+"""Sentinel returned by the export value function for settings not exported."""
+
+
+def _compile_export_value(add_ephemeral, skip_unset, use_defaults, unmutated):
+    """Returns a function that picks a setting's (value, source) to export, or ``_SKIP``.
+    """
+
+    def export_value(ckv, ephemeral, ask_hidden):
+        if ephemeral is None:
+            ephemeral = ckv.ephemeral
+            if ephemeral and not add_ephemeral:
+                return _SKIP
+        if ask_hidden and ckv.hidden:
+            return _SKIP
+        try:
+            if not ckv.persisted:
+                if skip_unset:
+                    # This includes ckv.ephemeral.
+                    return _SKIP
+                return (ckv.default if unmutated else ckv.value_from_default), 'default'
+            if use_defaults:
+                # ckv.default is the non-conformed input value;
+                # otherwise use the value after it's been internalized.
+                return (ckv.default if unmutated else ckv.value_from_default), 'default'
+            if unmutated:
+                return ckv.value_unmutated, 'config'
+            if ephemeral:
+                # The calculated (ephemeral) value is defined with the ckv
+                # method itself (and not the @settings decorator), which is
+                # accessed through the 'default' value, which will be the
+                # fall-through case for the broader value() method.
+                return ckv.resolve()
+            return ckv.value_from_config, 'config'
+        except AttributeError:
+            return _SKIP
+
+    return export_value
+
+
+class _ExportPlan(object):
+    """Precomputed steps for exporting one section with one set of options.
+
+    Settings whose ephemeral and hidden states are fixed values are included
+    or excluded when the plan is compiled. Callable ephemeral and hidden
+    predicates, and each setting's persisted state, are checked on export.
+    """
+
+    __slots__ = ('section', 'options', 'settings', 'sections', 'export_value')
+
+    def __init__(self, section, options):
+        self.section = section
+        self.options = options
+        add_ephemeral, add_hidden, skip_unset, use_defaults, unmutated = options
+        self.export_value = _compile_export_value(
+            add_ephemeral, skip_unset, use_defaults, unmutated,
+        )
+
+        settings = []
+        for name, ckv in section._key_vals.items():
+            # Use None to mean "ask the setting on export".
+            ephemeral = None if callable(ckv._ephemeral) else bool(ckv._ephemeral)
+            if ephemeral and not add_ephemeral:
+                continue
+            ask_hidden = False
+            if not add_hidden:
+                if callable(ckv._hidden):
+                    ask_hidden = True
+                elif ckv._hidden:
+                    continue
+            settings.append((name, ckv, ephemeral, ask_hidden))
+        self.settings = tuple(settings)
+
+        self.sections = tuple(
+            (name, conf_dcor._export_plan(options))
+            for name, conf_dcor in section._sections.items()
+        )
+
+    def export(self, config, keep_empties=False, visit=None):
+        """Updates the passed dict per the plan; returns the number of settings added.
+
+        If ``visit`` is a set of sections, other subsections are assumed
+        to have no settings to export, and are skipped.
+        """
+        n_settings = 0
+        for name, subplan in self.sections:
+            if visit is not None and subplan.section not in visit:
+                if keep_empties and name not in config:
+                    config[name] = {}
+                continue
+            if name in config:
+                n_settings += subplan.export(config[name], visit=visit)
+                continue
+            if not subplan.settings and not subplan.sections and not keep_empties:
+                continue
+            subsect = {}
+            n_subsect = subplan.export(subsect, visit=visit)
+            if n_subsect or keep_empties:
+                config[name] = subsect
+            n_settings += n_subsect
+        export_value = self.export_value
+        for name, ckv, ephemeral, ask_hidden in self.settings:
+            picked = export_value(ckv, ephemeral, ask_hidden)
+            if picked is not _SKIP:
+                config[name] = picked[0]
+                n_settings += 1
+        return n_settings
+
+    def walk(self, parts=(), visit=None):
+        """Yields (path parts tuple, value, source) for each setting, depth-first.
+
+        Only the chain of generators for the current section path is kept,
+        so memory use is proportional to the depth of the tree, not its size.
+
+        If ``visit`` is a set of sections, other subsections are skipped.
+        """
+        for name, subplan in self.sections:
+            if visit is None or subplan.section in visit:
+                yield from subplan.walk(parts + (name,), visit)
+        export_value = self.export_value
+        for name, ckv, ephemeral, ask_hidden in self.settings:
+            picked = export_value(ckv, ephemeral, ask_hidden)
+            if picked is not _SKIP:
+                yield (parts + (name,),) + picked
+
+
+class _SectionValuesView(ValuesView):
+    """Lazily lists a section's subsections and top-level settings values."""
+
+    __slots__ = ()
+
+    def __contains__(self, value):
+        for item in self:
+            if item is value or item == value:
+                return True
+        return False
+
+    def __iter__(self):
+        for name in self._mapping:
+            yield self._mapping._child_value(name)
+
+
+class _SectionItemsView(ItemsView):
+    """Lazily lists a section's (name, subsection or setting value) pairs."""
+
+    __slots__ = ()
+
+    def __contains__(self, item):
+        name, value = item
+        try:
+            found = self._mapping._child_value(name)
+        except KeyError:
+            return False
+        return found is value or found == value
+
+    def __iter__(self):
+        for name in self._mapping:
+            yield (name, self._mapping._child_value(name))
+
+
+def _compile_accessor(section):
+    """Generates an accessor class for the section, and returns its (only) instance."""
+    namespace = {
+        '__slots__': (),
+        '__doc__': section._innercls.__doc__,
+        '_': section,
+    }
+    for name, conf_dcor in section._sections.items():
+        namespace[name] = conf_dcor.compile_accessors()
+    for name, keyval in section._key_vals.items():
+        namespace[name] = property(_compile_getter(keyval), doc=keyval.doc)
+    cls = type('{}Accessor'.format(section._innercls.__name__), (object,), namespace)
+    return cls()
+
+
+def _compile_getter(keyval):
+    """Returns a property getter that reads the setting value."""
+
+    def getter(_accessor):
+        if keyval._val_mask & _MASK_CACHED:
+            return keyval._val_cached
+        return keyval.resolve()[0]
+
+    return getter
+
+
+def _materialized_class(section):
+    """Returns a new namedtuple class for the section's subsections and settings."""
+    names = [_identifier(name) for name in section._sections]
+    names.extend(_identifier(name) for name in section._key_vals)
+    typename = _identifier(section._name)
+    if not typename.isidentifier() or keyword.iskeyword(typename):
+        typename = 'Section'
+    return namedtuple(typename, names, rename=True)
+
+
+def _identifier(name):
+    return ''.join(char if char.isalnum() or char == '_' else '_' for char in name)
+
+
+def _frozen(value):
+    """Returns a hashable copy of a list, set, or dict value, or the value itself."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_frozen(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(value)
+    if isinstance(value, dict):
+        return tuple((key, _frozen(item)) for key, item in value.items())
+    return value
+
+
+class _SectionSnapshot(Mapping):
+    """An immutable, hashable copy of a section's subsections and settings values.
+
+    Use :meth:`ConfigDecorator.snapshot` to make a snapshot.
+    """
+
+    __slots__ = ('_sections', '_values', '_sep', '_hash')
+
+    def __init__(self, sections, values, sep):
+        self._sections = sections
+        self._values = values
+        self._sep = sep
+        self._hash = None
+
+    def __getitem__(self, path):
+        """Returns the subsection snapshot or setting value at the (dotted) path."""
+        try:
+            return self._values[path]
+        except KeyError:
+            pass
+        try:
+            return self._sections[path]
+        except KeyError:
+            pass
+        parts = path.split(self._sep)
+        if len(parts) == 1:
+            raise KeyError(path)
+        snap = self
+        for name in parts[:-1]:
+            try:
+                snap = snap._sections[name]
+            except KeyError:
+                raise KeyError(path)
+        try:
+            return snap[parts[-1]]
+        except KeyError:
+            raise KeyError(path)
+
+    def __iter__(self):
+        # Like ConfigDecorator, list subsections before settings.
+        yield from self._sections
+        yield from self._values
+
+    def __len__(self):
+        return len(self._sections) + len(self._values)
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, _SectionSnapshot):
+            # Compare like any other Mapping, e.g., against a dict.
+            return super(_SectionSnapshot, self).__eq__(other)
+        return self._values == other._values and self._sections == other._sections
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash((
+                frozenset(self._sections.items()),
+                frozenset(self._values.items()),
+            ))
+        return self._hash
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__, dict(self.items()))
+
+
+class _SettingHandle(object):
+    """References one setting, and caches its value until the configuration changes.
+
+    Use :meth:`ConfigDecorator.handle` to make a handle.
+    """
+
+    __slots__ = ('_root', '_path', '_keyval', '_stamp', '_value', '_generation')
+
+    def __init__(self, keyval):
+        section = keyval._section
+        self._root = section.find_root()
+        self._path = section.section_path(sep=[]) + [keyval._name]
+        self._keyval = keyval
+        self._stamp = self._root._schema_stamp
+        self._value = None
+        self._generation = None
+
+    @property
+    def value(self):
+        """Returns the setting value, which is cached until the configuration changes.
+        """
+        if self._generation == self._root._generation:
+            return self._value
+        return self._refresh()
+
+    @value.setter
+    def value(self, value):
+        self.setting.value = value
+
+    @property
+    def setting(self):
+        """Returns the setting, after finding it again if the schema has changed.
+        """
+        root = self._root
+        if self._stamp is not root._schema_stamp:
+            # Raises KeyError if the setting (or one of its sections) was removed.
+            conf_dcor = root
+            for name in self._path[:-1]:
+                conf_dcor = conf_dcor._sections[name]
+            self._keyval = conf_dcor._key_vals[self._path[-1]]
+            self._stamp = root._schema_stamp
+        return self._keyval
+
+    def _refresh(self):
+        generation = self._root._generation
+        keyval = self.setting
+        value = keyval.value
+        self._value = value
+        if keyval._val_mask & _MASK_CACHED:
+            self._generation = generation
+        # else, a dynamic (or mutable) default, which is resolved on every read.
+        return value
+
+
+# ***
+
 # Note that Python invokes the decorator with the item being decorated. If
 # you want to pass arguments to the decorator, you can call a function to
 # retain the arguments and to generate the actual decorator.
@@ -1012,7 +2365,8 @@ def section(cls_or_name, parent=None):
 
         # For calling _pull_kv_cache, have parent be self, so
         # one can add settings to the root config object.
-        cfg_dcor._pull_kv_cache(parent or cfg_dcor)
+        # Compare against None: an empty section has len() 0, and is falsey.
+        cfg_dcor._pull_kv_cache(parent if parent is not None else cfg_dcor)
 
         return cfg_dcor
 
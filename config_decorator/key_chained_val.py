@@ -24,15 +24,143 @@
 
 """Class to manage key-value settings."""
 
+import weakref
 from gettext import gettext as _
 
-import os
-
 __all__ = (
     'KeyChainedValue',
 )
 
 
+# Bits of KeyChainedValue._val_mask, indicating which source values are set.
+_MASK_FORCED = 1 << 0
+_MASK_CLIARG = 1 << 1
+_MASK_CONFIG = 1 << 2
+_MASK_CACHED = 1 << 3
+_MASK_DEFAULT = 1 << 4
+_MASK_DEFAULT_CONFORMED = 1 << 5
+_MASK_UNMUTATED = 1 << 6
+
+
+# ***
+
+def _identity(value):
+    return value
+
+
+def _deferred_pipeline(keyval, value):
+    # The first time a setting's value is conformed, deduce its type
+    # and compile its pipeline, which replaces this function.
+    return keyval._prepare_pipeline()(keyval, value)
+
+
+# Settings with the same validation and type options share one pipeline.
+# Use weak references so pipelines go away with the settings that use them.
+_pipelines = weakref.WeakValueDictionary()
+
+
+def _compiled_pipeline(validate_f, choices, conform_f, value_type, allow_none):
+    """Returns a function that validates and conforms a value for a setting.
+
+    The returned function is called ``pipeline(keyval, value)``, where keyval
+    is only used to format the error message if the value is not acceptable.
+    (Choices that compare equal, e.g., ``[1, 0]`` and ``[True, False]``, share
+    a pipeline, so the message lists the keyval's own choices.)
+    """
+    try:
+        key = (
+            validate_f, tuple(choices) if choices else None,
+            conform_f, value_type, allow_none,
+        )
+        return _pipelines[key]
+    except TypeError:
+        # Unhashable choices.
+        key = None
+    except KeyError:
+        pass
+    pipeline = _compile_pipeline(validate_f, choices, conform_f, value_type, allow_none)
+    if key is not None:
+        _pipelines[key] = pipeline
+    return pipeline
+
+
+def _compile_pipeline(validate_f, choices, conform_f, value_type, allow_none):
+
+    def _typify_none():
+        if allow_none:
+            return None
+        raise ValueError(_(" (No “None” values allowed)"))
+
+    def _typify_bool(value):
+        if value is None:
+            return _typify_none()
+        if isinstance(value, bool):
+            return value
+        elif value == 'True':
+            return True
+        elif value == 'False':
+            return False
+        raise ValueError(_(" (Expected a bool, or “True” or “False”)"))
+
+    def _typify(value):
+        if value is None:
+            return _typify_none()
+        try:
+            return value_type(value)
+        except Exception as err:
+            raise ValueError(_(" ({})").format(str(err)))
+
+    if conform_f is not None:
+        conform = conform_f
+    elif value_type is bool:
+        conform = _typify_bool
+    else:
+        conform = _typify
+
+    def _conform(keyval, value):
+        try:
+            return conform(value)
+        except Exception as err:
+            raise keyval._unrecognized_value(value, str(err))
+
+    if validate_f:
+        def pipeline(keyval, value):
+            try:
+                # The caller's validate will either raise or return a truthy.
+                valid = validate_f(value)
+            except Exception as err:
+                raise keyval._unrecognized_value(value, str(err))
+            if not valid:
+                raise keyval._unrecognized_value(value, '')
+            return _conform(keyval, value)
+    elif choices:
+        try:
+            lookup = frozenset(choices)
+        except TypeError:
+            lookup = choices
+
+        def pipeline(keyval, value):
+            try:
+                valid = value in lookup
+            except TypeError:
+                # Unhashable value.
+                valid = value in choices
+            if not valid:
+                raise keyval._unrecognized_value(
+                    value,
+                    _(' (Choose from: ‘{}’)').format(
+                        '’, ‘'.join(str(choice) for choice in keyval._choices)
+                    ),
+                )
+            return _conform(keyval, value)
+    else:
+        pipeline = _conform
+    return pipeline
+
+
+# ***
+
+
 class KeyChainedValue(object):
     """Represents one setting of a section of a hierarchical settings configuration.
 
@@ -41,6 +169,36 @@ class KeyChainedValue(object):
 
     _envvar_prefix = ''
 
+    # Settings trees can grow large, so skip the per-instance __dict__.
+    __slots__ = (
+        '_section',
+        '_name',
+        '_default_f',
+        '_choices',
+        '_doc',
+        '_ephemeral',
+        '_hidden',
+        '_validate_f',
+        '_conform_f',
+        '_recover_f',
+        '_dynamic_default',
+        '_value_allow_none',
+        '_value_type',
+        '_pipeline',
+        # The source values, which are only meaningful if
+        # the corresponding _val_mask bit is set.
+        '_val_forced',
+        '_val_cliarg',
+        '_val_config',
+        '_val_origin',
+        '_val_cached',
+        '_val_source',
+        '_val_unmutated',
+        '_val_default',
+        '_val_default_conformed',
+        '_val_mask',
+    )
+
     def __init__(
         self,
         section=None,
@@ -56,6 +214,7 @@ class KeyChainedValue(object):
         validate=None,
         conform=None,
         recover=None,
+        dynamic_default=None,
     ):
         """Inits a :class:`KeyChainedValue` object.
 
@@ -116,7 +275,15 @@ class KeyChainedValue(object):
                      value used internally. Useful for log levels, datetime, etc.
             recover: If set, function used to convert internal value back to
                      storable value. Useful to covert log level back to name, etc.
+            dynamic_default: If True, the default method is called every time the
+                             default value is needed. Otherwise, the default value
+                             is generated once, and then cached. If None, only
+                             ``ephemeral`` settings are treated as dynamic,
+                             because their defaults usually depend on other
+                             settings.
         """
+        self._val_mask = 0
+
         self._section = section
         self._name = name
         self._default_f = default_f
@@ -127,16 +294,31 @@ class KeyChainedValue(object):
         self._validate_f = validate
         self._conform_f = conform
         self._recover_f = recover
+        self._dynamic_default = dynamic_default
 
-        self._value_allow_none = allow_none
-        self._value_type = self._deduce_value_type(value_type)
+        # The default values are cached when first generated.
+        self._val_default = None
+        self._val_default_conformed = None
 
-        # These attributes will only be set if some particular
-        # source specifies a value:
-        #  self._val_forced
-        #  self._val_cliarg
-        #  self._val_envvar
-        #  self._val_config
+        self._value_allow_none = allow_none
+        # The value type is deduced when first needed, rather than now, so that
+        # the default method is not called when the settings are being defined.
+        self._value_type = value_type
+        self._pipeline = _deferred_pipeline
+
+        # These attributes will only be meaningful if some particular
+        # source specifies a value, as indicated by the _val_mask bits.
+        # (The "envvar" value is read from the root's environ snapshot.)
+        self._val_forced = None
+        self._val_cliarg = None
+        self._val_config = None
+        self._val_origin = None
+        # The cached value is set after the value is first resolved,
+        # and it's forgotten whenever one of the source values changes.
+        self._val_cached = None
+        self._val_source = None
+        # Likewise for the storable (stringified) value.
+        self._val_unmutated = None
 
     @property
     def name(self):
@@ -147,8 +329,44 @@ class KeyChainedValue(object):
     @property
     def default(self):
         """Returns the default setting value.
+
+        The default method is called once and the value is cached,
+        unless the setting was defined with ``dynamic_default=True``,
+        or the default is a list, dict, or set (which the caller might
+        change, so a new one is made each time).
         """
-        return self._default_f(self._section)
+        if self._val_mask & _MASK_DEFAULT:
+            return self._val_default
+        default = self._default_f(self._section)
+        # The section is None while the config is being built (e.g., when the
+        # value type is deduced), so wait until later to cache the default.
+        if (
+            self._section is not None
+            and not self.dynamic_default
+            and not isinstance(default, (list, dict, set))
+        ):
+            self._val_default = default
+            self._val_mask |= _MASK_DEFAULT
+        return default
+
+    @property
+    def dynamic_default(self):
+        """Returns True if the default value is generated anew on every access.
+        """
+        if self._dynamic_default is None:
+            return bool(self._ephemeral)
+        return self._dynamic_default
+
+    def _prepare_pipeline(self):
+        self._value_type = self._deduce_value_type(self._value_type)
+        self._pipeline = _compiled_pipeline(
+            self._validate_f,
+            self._choices,
+            self._conform_f,
+            self._value_type,
+            self._value_allow_none,
+        )
+        return self._pipeline
 
     def _deduce_value_type(self, value_type=None):
         if value_type is not None:
@@ -156,8 +374,11 @@ class KeyChainedValue(object):
             # but they're encouraged to stick to builtin types, and to
             # use `conform` if they need to change values on input.
             return value_type
-        elif self.ephemeral:
-            return lambda val: val
+        elif self._ephemeral and not callable(self._ephemeral):
+            # Callable ephemerals are not considered here, because the
+            # type used to be deduced before the setting had a section, when
+            # the ephemeral callback would not have been called.
+            return _identity
         return self._deduce_default_type()
 
     def _deduce_default_type(self):
@@ -170,7 +391,7 @@ class KeyChainedValue(object):
             # the user did not specify the type of None that is the default.
             # So rather than assume, the type function is just the identity.
             # (The user cat set value_type to be explicit about the type.
-            return lambda val: val
+            return _identity
         elif isinstance(default_value, bool):
             return bool
         elif isinstance(default_value, int):
@@ -232,29 +453,10 @@ class KeyChainedValue(object):
     def persisted(self):
         """Returns True if the setting value was set via :meth:`value_from_config`.
         """
-        return hasattr(self, '_val_config')
-
-    def _typify(self, value):
-        if value is None:
-            if self._value_allow_none:
-                return value
-            raise ValueError(_(" (No “None” values allowed)"))
-        if self._value_type is bool:
-            if isinstance(value, bool):
-                return value
-            elif value == 'True':
-                return True
-            elif value == 'False':
-                return False
-            else:
-                raise ValueError(_(" (Expected a bool, or “True” or “False”)"))
-        try:
-            value = self._value_type(value)
-        except Exception as err:
-            raise ValueError(_(" ({})").format(str(err)))
-        return value
+        return bool(self._val_mask & _MASK_CONFIG)
 
-    def _typify_list(self, value):
+    @staticmethod
+    def _typify_list(value):
         # Handle ConfigObj parsing a string without finding commas to
         # split on, but the @setting indicating it's a list; or a
         # default method returning [] so we avoid calling list([]).
@@ -304,29 +506,83 @@ class KeyChainedValue(object):
 
             - Finally, if a value was not obtained from any of the above
               sources, the default value is returned.
+
+            The resolved value is cached, and it's only resolved again after
+            one of the source setters is called, or after
+            :meth:`config_decorator.config_decorator.ConfigDecorator.refresh_environ`
+            notices that the setting's environment variable changed.
+        """
+        if self._val_mask & _MASK_CACHED:
+            return self._val_cached
+        return self.resolve()[0]
+
+    def resolve(self):
+        """Returns the setting value and the name of its source, resolved in one pass.
+
+        Returns:
+            A (value, source) tuple, i.e., the same as calling
+            :meth:`value` and :meth:`source`, but without walking
+            the source chain twice.
         """
+        if self._val_mask & _MASK_CACHED:
+            return self._val_cached, self._val_source
+        environ = self._section._environ_snapshot()
+        value, source = self._resolve_value()
+        # A default value is only cached if the default itself is cached.
+        if source != 'default' or self._val_mask & _MASK_DEFAULT:
+            self._val_cached = value
+            self._val_source = source
+            self._val_mask |= _MASK_CACHED
+            # If refresh_environ() swapped the environment snapshot (e.g., from
+            # the poll_environ timer thread) while this value was resolved, the
+            # value might have been read from the old snapshot, so don't keep it.
+            if self._section.find_root()._environ is not environ:
+                self._forget_cached()
+        return value, source
+
+    def _resolve_value(self):
+        """Returns the resolved value, and the name of the source it came from."""
+        mask = self._val_mask
         # Honor forced values foremost.
-        try:
-            return self.value_from_forced
-        except AttributeError:
-            pass
+        if mask & _MASK_FORCED:
+            return self._val_forced, 'forced'
         # Honor CLI-specific values secondmost.
-        try:
-            return self.value_from_cliarg
-        except AttributeError:
-            pass
+        if mask & _MASK_CLIARG:
+            return self._val_cliarg, 'cliarg'
         # Check the environment third.
         try:
-            return self.value_from_envvar
+            return self.value_from_envvar, 'envvar'
         except KeyError:
             pass
         # See if the config value was specified by the config that was read.
-        try:
-            return self.value_from_config
-        except AttributeError:
-            pass
+        if mask & _MASK_CONFIG:
+            return self._val_config, 'config'
         # Nothing found so far! Finally just return the default value.
-        return self._value_conform_and_validate(self.default)
+        return self.value_from_default, 'default'
+
+    def _facet_changed(self, mask):
+        """Adds or removes the setting from the root section's source facet, if built."""
+        if self._section is None:
+            return
+        facets = self._section.find_root()._facets
+        if facets is None:
+            return
+        if self._val_mask & mask:
+            facets[mask][self] = None
+        else:
+            facets[mask].pop(self, None)
+
+    def _forget_cached(self):
+        self._val_cached = None
+        self._val_source = None
+        self._val_unmutated = None
+        self._val_mask &= ~(_MASK_CACHED | _MASK_UNMUTATED)
+        # Tell the section and its ancestors that a value may have changed
+        # (for setting handles, and materialized sections; see ConfigDecorator).
+        section = self._section
+        while section is not None:
+            section._generation += 1
+            section = section._parent
 
     @value.setter
     def value(self, value):
@@ -345,52 +601,17 @@ class KeyChainedValue(object):
         # config file, or that the user wishes to set in the file.
         # Don't call the wrapper, which would call conform-validate again.
         #   NOPE: self.value_from_config = value
-        self._val_config = value
-        self._val_origin = orig_value
+        self._set_config(value, orig_value)
 
     def _value_conform_and_validate(self, value):
+        return self._pipeline(self, value)
 
-        def _corformidate():
-            _value = value
-            addendum = None
-            if addendum is None:
-                addendum = _validate(_value)
-            if addendum is None:
-                try:
-                    _value = _conform_or_typify(_value)
-                except Exception as err:
-                    addendum = str(err)
-            if addendum is not None:
-                raise ValueError(
-                    _("Unrecognized value for setting ‘{}’: “{}”{}").format(
-                        self._name, value, addendum,
-                    ),
-                )
-            return _value
-
-        def _conform_or_typify(_value):
-            if self._conform_f is not None:
-                return self._conform_f(_value)
-            return self._typify(value)
-
-        def _validate(_value):
-            # Returns None if valid value, or string if it's not.
-            addendum = None
-            if self._validate_f:
-                try:
-                    # The caller's validate will either raise or return a truthy.
-                    if not self._validate_f(_value):
-                        addendum = ''
-                except Exception as err:
-                    addendum = str(err)
-            elif self._choices:
-                if _value not in self._choices:
-                    addendum = _(' (Choose from: ‘{}’)').format(
-                        '’, ‘'.join(self._choices)
-                    )
-            return addendum
-
-        return _corformidate()
+    def _unrecognized_value(self, value, addendum):
+        return ValueError(
+            _("Unrecognized value for setting ‘{}’: “{}”{}").format(
+                self._name, value, addendum,
+            ),
+        )
 
     # ***
 
@@ -398,7 +619,13 @@ class KeyChainedValue(object):
     def value_from_default(self):
         """Returns the conformed default value.
         """
-        return self._value_conform_and_validate(self.default)
+        if self._val_mask & _MASK_DEFAULT_CONFORMED:
+            return self._val_default_conformed
+        value = self._value_conform_and_validate(self.default)
+        if self._val_mask & _MASK_DEFAULT:
+            self._val_default_conformed = value
+            self._val_mask |= _MASK_DEFAULT_CONFORMED
+        return value
 
     # ***
 
@@ -406,6 +633,8 @@ class KeyChainedValue(object):
     def value_from_forced(self):
         """Returns the "forced" setting value.
         """
+        if not self._val_mask & _MASK_FORCED:
+            raise AttributeError('_val_forced')
         return self._val_forced
 
     @value_from_forced.setter
@@ -415,7 +644,13 @@ class KeyChainedValue(object):
         Args:
             value_from_forced: The forced setting value.
         """
-        self._val_forced = self._value_conform_and_validate(value_from_forced)
+        self._set_forced(self._value_conform_and_validate(value_from_forced))
+
+    def _set_forced(self, value):
+        self._val_forced = value
+        self._val_mask |= _MASK_FORCED
+        self._forget_cached()
+        self._facet_changed(_MASK_FORCED)
 
     # ***
 
@@ -423,6 +658,8 @@ class KeyChainedValue(object):
     def value_from_cliarg(self):
         """Returns the "cliarg" setting value.
         """
+        if not self._val_mask & _MASK_CLIARG:
+            raise AttributeError('_val_cliarg')
         return self._val_cliarg
 
     @value_from_cliarg.setter
@@ -432,13 +669,19 @@ class KeyChainedValue(object):
         Args:
             value_from_cliarg: The forced setting value.
         """
-        self._val_cliarg = self._value_conform_and_validate(value_from_cliarg)
+        self._set_cliarg(self._value_conform_and_validate(value_from_cliarg))
+
+    def _set_cliarg(self, value):
+        self._val_cliarg = value
+        self._val_mask |= _MASK_CLIARG
+        self._forget_cached()
+        self._facet_changed(_MASK_CLIARG)
 
     # ***
 
     @property
     def value_from_envvar(self):
-        """Returns the "envvar" setting value, sourced from the environment when called.
+        """Returns the "envvar" setting value, sourced from the environment snapshot.
 
         A name derived from a special prefix, the section path,
         and the setting name is used to look for an environment
@@ -450,15 +693,22 @@ class KeyChainedValue(object):
         If the setting is named "foot",
         then the environment variable would be named,
         "CFGDEC_HOKEY_POKEY_FOOT".
+
+        The environment is read once, when the first value is resolved,
+        and then again only when
+        :meth:`config_decorator.config_decorator.ConfigDecorator.refresh_environ`
+        is called.
         """
-        environame = '{}{}_{}'.format(
-            KeyChainedValue._envvar_prefix,
+        envval = self._section._environ_snapshot()[self._envvar_name()]
+        envval = self._value_conform_and_validate(envval)
+        return envval
+
+    def _envvar_name(self):
+        return '{}{}_{}'.format(
+            self._section.envvar_prefix,
             self._section.section_path(sep='_').upper(),
             self._name.upper(),
         )
-        envval = os.environ[environame]
-        envval = self._value_conform_and_validate(envval)
-        return envval
 
     # ***
 
@@ -466,6 +716,8 @@ class KeyChainedValue(object):
     def value_from_config(self):
         """Returns the "config" setting value.
         """
+        if not self._val_mask & _MASK_CONFIG:
+            raise AttributeError('_val_config')
         return self._val_config
 
     @value_from_config.setter
@@ -476,33 +728,55 @@ class KeyChainedValue(object):
             value_from_config: The forced setting value.
         """
         orig_value = value_from_config
-        self._val_config = self._value_conform_and_validate(value_from_config)
+        value = self._value_conform_and_validate(value_from_config)
+        self._set_config(value, orig_value)
+
+    def _set_config(self, value, orig_value):
+        self._val_config = value
         self._val_origin = orig_value
+        self._val_mask |= _MASK_CONFIG
+        self._forget_cached()
+        self._facet_changed(_MASK_CONFIG)
 
     def forget_config_value(self):
         """Removes the "config" setting value set by the :meth:`value_from_config` setter.
         """
-        try:
-            del self._val_config
-        except AttributeError:
-            pass
+        self._val_config = None
+        self._val_origin = None
+        self._val_mask &= ~_MASK_CONFIG
+        self._forget_cached()
+        self._facet_changed(_MASK_CONFIG)
 
     # ***
 
     @property
     def value_unmutated(self):
-        """Returns the storable config value, generally just the stringified value."""
-        try:
+        """Returns the storable config value, generally just the stringified value.
+
+        The storable value is cached alongside the resolved value,
+        and it's forgotten whenever one of the source values changes.
+        """
+        if self._val_mask & _MASK_UNMUTATED:
+            return self._val_unmutated
+        if self._val_mask & _MASK_CONFIG:
             # Prefer the config value as original input, i.e., try to keep
             # the output same as user's input. But still cast to string.
             # Mostly just avoid whatever self.conform_f may have done.
-            return str(self._val_origin)
-        except AttributeError:
+            unmutated = str(self._val_origin)
+        else:
             # No config value set, so stringify the most prominent value.
+            value = self.value
             if self._recover_f:
-                return self._recover_f(self.value)
+                unmutated = self._recover_f(value)
             else:
-                return str(self.value)
+                unmutated = str(value)
+            if not self._val_mask & _MASK_CACHED:
+                # The value is a dynamic (or mutable) default, so it is not
+                # cached, either.
+                return unmutated
+        self._val_unmutated = unmutated
+        self._val_mask |= _MASK_UNMUTATED
+        return unmutated
 
     # ***
 
@@ -542,26 +816,5 @@ class KeyChainedValue(object):
             - Finally, if a value was not obtained from any of the above
               sources, the value 'default' is returned.
         """
-        # Honor forced values foremost.
-        try:
-            return self.value_from_forced and 'forced'
-        except AttributeError:
-            pass
-        # Honor CLI-specific values secondmost.
-        try:
-            return self.value_from_cliarg and 'cliarg'
-        except AttributeError:
-            pass
-        # Check the environment third.
-        try:
-            return self.value_from_envvar and 'envvar'
-        except KeyError:
-            pass
-        # See if the config value was specified by the config that was read.
-        try:
-            return self.value_from_config and 'config'
-        except AttributeError:
-            pass
-        # Nothing found so far! Finally just return the default value.
-        return 'default'
+        return self.resolve()[1]
 
@@ -33,10 +33,10 @@ setup(
 
     # Specify which package(s) to install.
     # - Without any rules, find_packages returns, e.g.,
-    #     ['config_decorator', 'tests', 'tests.config_decorator']
-    # - With the 'exclude*' rule, this call is essentially:
+    #     ['config_decorator', 'benchmarks', 'tests', 'tests.config_decorator']
+    # - With the 'exclude*' rules, this call is essentially:
     #     packages=['config_decorator']
-    packages=find_packages(exclude=['tests*']),
+    packages=find_packages(exclude=['benchmarks*', 'tests*']),
 
     # Tell setuptools to determine the version
     # from the latest SCM (git) version tag.
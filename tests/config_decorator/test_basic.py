@@ -160,8 +160,12 @@ def generate_config_root_unknown_type():
 
 class TestSectionSettingDefaultUnknownType:
     def test_section_method(self):
+        # The value type is not deduced until the value is first used.
+        rootcfg = generate_config_root_unknown_type()
         with pytest.raises(NotImplementedError):
-            _rootcfg = generate_config_root_unknown_type()  # noqa: F841: var !used
+            rootcfg['foo']
+        with pytest.raises(NotImplementedError):
+            rootcfg['foo'] = 'bar'
 
 
 # ***
@@ -187,8 +191,10 @@ def generate_config_root_unknown_bool_string():
 class TestSectionSettingDefaultUnknownBoolDefault:
     def test_section_method(self):
         rootcfg = generate_config_root_unknown_bool_string()
+        # The items view is lazy, so the value is not validated until read.
+        items = rootcfg.items()
         with pytest.raises(ValueError):
-            _items = rootcfg.items()  # noqa: F841: local var... never used
+            list(items)
 
 
 # ***
@@ -225,3 +231,55 @@ class TestSectionSettingValidationFail:
         with pytest.raises(ValueError):
             rootcfg['validate_bool_string_fail_test'] = 123
 
+
+# ***
+
+class TestKeyChainedValueMemory:
+    def test_bytes_per_setting(self):
+        import tracemalloc
+
+        from config_decorator import KeyChainedValue
+
+        def default_f(section):
+            return ''
+
+        n_settings = 10000
+        tracemalloc.start()
+        try:
+            traced_before = tracemalloc.get_traced_memory()[0]
+            keyvals = [
+                KeyChainedValue(name='foo', default_f=default_f, value_type=str)
+                for _ in range(n_settings)
+            ]
+            traced_after = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        bytes_per_setting = (traced_after - traced_before) / n_settings
+        print('KeyChainedValue: {:.0f} bytes per setting'.format(bytes_per_setting))
+        assert not hasattr(keyvals[0], '__dict__')
+        assert bytes_per_setting < 256
+
+
+# ***
+
+class TestSectionSettingDefaultNotCalledOnDecoration:
+    def test_section_method(self):
+        calls = []
+
+        @section(None)
+        class RootSection(object):
+            pass
+
+        @RootSection.section(None)
+        class RootSectionReal(object):
+            @property
+            @RootSection.setting('test')
+            def foo(self):
+                calls.append('foo')
+                return 123
+
+        assert not calls
+        assert RootSection['foo'] == 123
+        assert RootSection['foo'] == 123
+        assert calls == ['foo']
+
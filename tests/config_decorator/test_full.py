@@ -26,6 +26,7 @@ import pytest
 
 from config_decorator import section
 from config_decorator.config_decorator import ConfigDecorator
+from config_decorator.key_chained_val import _MASK_CACHED
 
 
 def generate_config_root():
@@ -265,6 +266,14 @@ class TestConfigDecoratorSetDefault:
         with pytest.raises(TypeError):
             rootcfg.setdefault('missing.value')
 
+    def test_dotted_name_added_to_subsection(self):
+        rootcfg = generate_config_root()
+        rootcfg.setdefault('level1.added', 'value')
+        assert 'added' not in rootcfg._key_vals
+        assert rootcfg['level1']._key_vals['added']._section is rootcfg['level1']
+        assert rootcfg['level1.added'] == 'value'
+        assert rootcfg.as_dict()['level1']['added'] == 'value'
+
 
 # ***
 
@@ -286,6 +295,87 @@ class TestConfigDecoratorKeysValuesItems:
         _items = rootcfg.items()  # noqa: F841: var never used
 
 
+# ***
+
+class TestConfigDecoratorMappingViews:
+    def test_views_are_live_and_lazy(self):
+        rootcfg = generate_config_root()
+        assert 'level1' in rootcfg.keys()
+        assert 'level1.level2' not in rootcfg
+        level1 = rootcfg['level1']
+        keys = level1.keys()
+        items = level1.items()
+        assert 'foo' in level1
+        assert len(keys) == len(level1._sections) + len(level1._key_vals)
+        assert list(level1) == list(keys)
+        # Views do not resolve setting values until they're iterated.
+        assert not level1._key_vals['foo']._val_mask & _MASK_CACHED
+        assert ('foo', 'baz') in items
+        assert dict(items)['level2'] is level1._sections['level2']
+        assert 'baz' in level1.values()
+        # Views reflect later changes.
+        level1['foo'] = 'bat'
+        assert ('foo', 'bat') in items
+        level1.setdefault('new_setting', 'qux')
+        assert 'new_setting' in keys
+        assert dict(items)['new_setting'] == 'qux'
+
+    def test_mapping_protocol(self):
+        rootcfg = generate_config_root()
+        assert hash(rootcfg) == hash(rootcfg)
+        assert rootcfg.get('level1.foo') == 'baz'
+        assert rootcfg.get('level1.level2.baz') == 'bat'
+        assert rootcfg.get('no_such_setting') is None
+        assert rootcfg.get('no_such_setting', 'default') == 'default'
+
+    def test_empty_section_is_still_a_parent(self):
+        @section(None)
+        class RootSection(object):
+            pass
+
+        @RootSection.section('empty')
+        class RootSectionEmpty(object):
+            pass
+
+        @RootSectionEmpty.section('child')
+        class RootSectionChild(object):
+            @property
+            @RootSectionEmpty.setting('test')
+            def foo(self):
+                return 'bar'
+
+        assert RootSection['empty.child.foo'] == 'bar'
+
+    def test_direct_child_shadows_nested_namesake(self):
+        @section(None)
+        class RootSection(object):
+            pass
+
+        @RootSection.section('sec')
+        class RootSectionSec(object):
+            @property
+            @RootSection.setting('direct')
+            def b(self):
+                return 'outer'
+
+        @RootSectionSec.section('inner')
+        class RootSectionInner(object):
+            @property
+            @RootSectionSec.setting('nested')
+            def b(self):
+                return 'inner'
+
+        sec = RootSection['sec']
+        assert 'b' in sec
+        assert sec['b'] == 'outer'
+        assert sec.get('b') == 'outer'
+        assert dict(sec.items())['b'] == sec['b']
+        assert sec['inner.b'] == 'inner'
+        # Names that are not direct children are still searched for.
+        with pytest.raises(AttributeError):
+            RootSection['b']
+
+
 # ***
 
 class TestConfigDecoratorAttributeMagic:
@@ -572,6 +662,7 @@ class TestSectionSettingPrecedence:
         environame = 'TEST_LEVEL1_FOO'
         import os
         os.environ[environame] = 'zab'
+        rootcfg.refresh_environ()
         assert rootcfg.asobj.level1.foo.value == 'zab'
         # Note that int will be converted to setting type, which is string.
         rootcfg.asobj.level1.foo.value_from_cliarg = 123
@@ -579,4 +670,1048 @@ class TestSectionSettingPrecedence:
         #
         rootcfg.asobj.level1.foo.value_from_forced = 'perfect!'
         assert rootcfg.asobj.level1.foo.value == 'perfect!'
+        del os.environ[environame]
+
+
+# ***
+
+class TestSectionSettingValueCached:
+    def test_cache_invalidated_by_setters(self):
+        rootcfg = generate_config_root()
+        setting = rootcfg.asobj.level1.foo
+        assert setting.value == 'baz'
+        assert setting._val_cached == 'baz'
+        setting.value = 'bat'
+        assert setting.value == 'bat'
+        setting.value_from_config = 'cfg'
+        assert setting.value == 'cfg'
+        setting.value_from_cliarg = 'cli'
+        assert setting.value == 'cli'
+        setting.value_from_forced = 'frc'
+        assert setting.value == 'frc'
+
+    def test_cache_invalidated_by_environ(self):
+        rootcfg = generate_config_root()
+        from config_decorator.key_chained_val import KeyChainedValue
+        KeyChainedValue._envvar_prefix = 'TEST_'
+        environame = 'TEST_LEVEL1_FOO'
+        import os
+        assert rootcfg['level1.foo'] == 'baz'
+        os.environ[environame] = 'zab'
+        # The environment snapshot is not updated until refreshed.
+        assert rootcfg['level1.foo'] == 'baz'
+        rootcfg.refresh_environ()
+        assert rootcfg['level1.foo'] == 'zab'
+        del os.environ[environame]
+        rootcfg['level1'].refresh_environ()
+        assert rootcfg['level1.foo'] == 'baz'
+
+    def test_cache_invalidated_by_environ_poll(self):
+        rootcfg = generate_config_root()
+        from config_decorator.key_chained_val import KeyChainedValue
+        KeyChainedValue._envvar_prefix = 'TEST_'
+        environame = 'TEST_LEVEL1_FOO'
+        import os
+        import time
+        assert rootcfg['level1.foo'] == 'baz'
+        os.environ[environame] = 'zab'
+        rootcfg.poll_environ(0.01)
+        try:
+            for _attempt in range(100):
+                if rootcfg['level1.foo'] == 'zab':
+                    break
+                time.sleep(0.01)
+            assert rootcfg['level1.foo'] == 'zab'
+        finally:
+            rootcfg.poll_environ(None)
+            del os.environ[environame]
+
+    def test_environ_poll_stopped_during_refresh(self):
+        import threading
+        rootcfg = generate_config_root()
+        refreshed = threading.Event()
+
+        def refresh_environ():
+            rootcfg.poll_environ(None)
+            refreshed.set()
+
+        rootcfg.refresh_environ = refresh_environ
+        rootcfg.poll_environ(0.01)
+        poller = rootcfg._environ_poller
+        assert refreshed.wait(5)
+        poller.join(5)
+        assert rootcfg._environ_poller is None
+
+    def test_environ_refreshed_while_resolving(self):
+        import os
+        environame = 'TEST4_RACE_RACY'
+
+        def refresh_midway(value):
+            # Simulate the poller refreshing between the read and the cache.
+            os.environ[environame] = 'new'
+            RootSection.refresh_environ()
+            return value
+
+        @section(None)
+        class RootSection(object):
+            pass
+
+        @RootSection.section('race')
+        class RootSectionRace(object):
+            @property
+            @RootSection.setting('test', conform=refresh_midway)
+            def racy(self):
+                return 'default'
+
+        RootSection.envvar_prefix = 'TEST4_'
+        os.environ[environame] = 'old'
+        try:
+            RootSection.refresh_environ()
+            assert RootSection['race.racy'] == 'old'
+            assert RootSection['race.racy'] == 'new'
+        finally:
+            del os.environ[environame]
+
+    def test_cache_invalidated_by_forget(self):
+        rootcfg = generate_config_root()
+        rootcfg['level1.foo'] = 'bat'
+        assert rootcfg['level1.foo'] == 'bat'
+        rootcfg.forget_config_values()
+        assert rootcfg['level1.foo'] == 'baz'
+
+    def test_cache_ephemeral_default_not_cached(self):
+        rootcfg = generate_config_root()
+        setting = rootcfg.asobj.ephemeral_test
+        assert setting.value == 'This will not be saved!'
+        assert not setting._val_mask & _MASK_CACHED
+
+
+# ***
+
+class TestSectionSettingEnvvarPrefixPerRoot:
+    def test_something(self):
+        import os
+        rootcfg1 = generate_config_root()
+        rootcfg2 = generate_config_root()
+        rootcfg1.envvar_prefix = 'TEST1_'
+        rootcfg2['level1'].envvar_prefix = 'TEST2_'
+        assert rootcfg2.envvar_prefix == 'TEST2_'
+        os.environ['TEST1_LEVEL1_FOO'] = 'one'
+        os.environ['TEST2_LEVEL1_FOO'] = 'two'
+        try:
+            rootcfg1.refresh_environ()
+            rootcfg2.refresh_environ()
+            assert rootcfg1['level1.foo'] == 'one'
+            assert rootcfg2['level1.foo'] == 'two'
+            os.environ['TEST2_LEVEL1_FOO'] = 'deux'
+            rootcfg1.refresh_environ()
+            rootcfg2.refresh_environ()
+            assert rootcfg1['level1.foo'] == 'one'
+            assert rootcfg2['level1.foo'] == 'deux'
+            assert rootcfg2._envvar_index['TEST2_LEVEL1_FOO'] == [
+                rootcfg2.asobj.level1.foo,
+            ]
+        finally:
+            del os.environ['TEST1_LEVEL1_FOO']
+            del os.environ['TEST2_LEVEL1_FOO']
+
+    def test_index_add_section(self):
+        import os
+        rootcfg = generate_config_root()
+        rootcfg.envvar_prefix = 'TEST3_'
+        rootcfg.refresh_environ()
+        rootcfg.setdefault('level1.added', 'default')
+        os.environ['TEST3_LEVEL1_ADDED'] = 'from env'
+        try:
+            rootcfg.refresh_environ()
+            assert rootcfg['level1.added'] == 'from env'
+        finally:
+            del os.environ['TEST3_LEVEL1_ADDED']
+
+    def test_settings_sharing_envvar_name(self):
+        import os
+
+        @section(None)
+        class RootSection(object):
+            pass
+
+        RootSection.envvar_prefix = 'TEST5_'
+        RootSection.setdefault('a_b.c', 'x')
+        RootSection.setdefault('a.b_c', 'y')
+        assert (RootSection['a_b.c'], RootSection['a.b_c']) == ('x', 'y')
+        os.environ['TEST5_A_B_C'] = 'env'
+        try:
+            RootSection.refresh_environ()
+            assert (RootSection['a_b.c'], RootSection['a.b_c']) == ('env', 'env')
+            assert len(list(RootSection.iter_settings(source='envvar'))) == 2
+            del RootSection['a_b'][RootSection.asobj.a_b.c]
+            assert list(RootSection.iter_settings(source='envvar')) == [
+                RootSection.asobj.a.b_c,
+            ]
+        finally:
+            del os.environ['TEST5_A_B_C']
+
+
+# ***
+
+class TestSectionSettingResolve:
+    def test_resolve_sources(self):
+        rootcfg = generate_config_root()
+        setting = rootcfg.asobj.level1.foo
+        assert setting.resolve() == ('baz', 'default')
+        setting.value = 'bat'
+        assert setting.resolve() == ('bat', 'config')
+        setting.value_from_cliarg = 'cli'
+        assert setting.resolve() == ('cli', 'cliarg')
+        assert setting.source == 'cliarg'
+
+    def test_source_falsy_forced_value(self):
+        rootcfg = generate_config_root()
+        setting = rootcfg.asobj.validate_bool_string_true_test
+        setting.value_from_forced = False
+        assert setting.value is False
+        assert setting.source == 'forced'
+
+
+# ***
+
+class TestSectionSettingDefaultCached:
+    def generate_config_counted_defaults(self, calls):
+        @section(None)
+        class RootSection(object):
+            pass
+
+        @RootSection.section('counted')
+        class RootSectionCounted(object):
+            @property
+            @RootSection.setting(
+                "Static default.",
+                value_type=str,
+            )
+            def static(self):
+                calls.append('static')
+                return 'foo'
+
+            @property
+            @RootSection.setting(
+                "Dynamic default.",
+                value_type=str,
+                dynamic_default=True,
+            )
+            def dynamic(self):
+                calls.append('dynamic')
+                return 'bar'
+
+        return RootSection
+
+    def test_static_default_called_once(self):
+        calls = []
+        rootcfg = self.generate_config_counted_defaults(calls)
+        for _ in range(3):
+            assert rootcfg.asobj.counted.static.default == 'foo'
+            assert rootcfg.asobj.counted.static.value_from_default == 'foo'
+            rootcfg.as_dict(use_defaults=True)
+        assert calls.count('static') == 1
+
+    def test_dynamic_default_called_every_time(self):
+        calls = []
+        rootcfg = self.generate_config_counted_defaults(calls)
+        for _ in range(3):
+            assert rootcfg['counted.dynamic'] == 'bar'
+        assert calls.count('dynamic') == 3
+
+    def test_mutable_default_not_shared(self):
+        @section(None)
+        class RootSection(object):
+            pass
+
+        @RootSection.section('s')
+        class RootSectionS(object):
+            @property
+            @RootSection.setting('List default.')
+            def lst(self):
+                return [1, 2]
+
+        RootSection['s.lst'].append(99)
+        assert RootSection['s.lst'] == [1, 2]
+        assert RootSection.asobj.s.lst.default == [1, 2]
+        assert RootSection.as_dict(use_defaults=True) == {'s': {'lst': [1, 2]}}
+
+
+# ***
+
+class TestSectionSettingPipeline:
+    def test_pipeline_shared_by_similar_settings(self):
+        rootcfg = generate_config_root()
+        foo = rootcfg.asobj.level1.foo
+        baz = rootcfg.asobj.level1.level2.baz
+        choices = rootcfg.asobj.choices_test
+        # The pipelines are compiled on first use.
+        for setting in (foo, baz, choices):
+            setting.value
+        assert foo._pipeline is baz._pipeline
+        assert choices._pipeline is not foo._pipeline
+
+    def test_pipeline_error_message(self):
+        rootcfg = generate_config_root()
+        with pytest.raises(ValueError) as excinfo:
+            rootcfg.asobj.choices_test.value = 'four'
+        assert str(excinfo.value) == (
+            "Unrecognized value for setting ‘choices_test’: “four”"
+            " (Choose from: ‘’, ‘one’, ‘two’, ‘three’)"
+        )
+        with pytest.raises(ValueError):
+            rootcfg.asobj.validate_bool_string_true_test.value = 'Tralse'
+
+    def test_pipeline_error_message_own_choices(self):
+        @section(None)
+        class RootSection(object):
+            pass
+
+        @RootSection.section('s')
+        class RootSectionS(object):
+            @property
+            @RootSection.setting('Flag.', value_type=int, choices=[True, False])
+            def flag(self):
+                return 1
+
+            @property
+            @RootSection.setting('Number.', value_type=int, choices=[1, 0])
+            def num(self):
+                return 1
+
+        flag = RootSection.asobj.s.flag
+        num = RootSection.asobj.s.num
+        flag.value
+        num.value
+        # Equal choices share a pipeline, but not the error message.
+        assert flag._pipeline is num._pipeline
+        with pytest.raises(ValueError) as excinfo:
+            num.value = 5
+        assert str(excinfo.value).endswith(" (Choose from: ‘1’, ‘0’)")
+
+
+# ***
+
+class TestConfigDecoratorPathIndex:
+    def test_lookups_use_index(self):
+        rootcfg = generate_config_root()
+        assert rootcfg['level1.level2.baz'] == 'bat'
+        baz = rootcfg._setting_index['level1.level2.baz']
+        assert baz is rootcfg.asobj.level1.level2.baz
+        assert rootcfg._section_index['level1.level2'] is rootcfg['level1']['level2']
+        # Subsections answer relative lookups from the root's index.
+        assert rootcfg['level1']['level2.baz'] == 'bat'
+        assert rootcfg['level1'].find_setting(['level2', 'baz']) is baz
+        # Names that contain the separator are not indexed.
+        assert 'level1.2' not in rootcfg._section_index
+
+    def test_dotted_section_name_not_confused(self):
+        rootcfg = generate_config_root()
+        dotted = rootcfg._sections['level1.2']
+        dotted.setdefault('level2.baz', 'own')
+        # Same path when joined, but under level1 → 2 → level2 instead.
+        rootcfg.setdefault('level1.2.level2.baz', 'other')
+        assert dotted['level2.baz'] == 'own'
+        dotted['level2.baz'] = 'set'
+        assert dotted['level2.baz'] == 'set'
+        assert rootcfg['level1']['2.level2.baz'] == 'other'
+
+    def test_index_maintained(self):
+        rootcfg = generate_config_root()
+        assert rootcfg['level1.foo'] == 'baz'
+        rootcfg.setdefault('level1.level3.new', 'value')
+        assert 'level1.level3' in rootcfg._section_index
+        assert rootcfg._setting_index['level1.level3.new'].value == 'value'
+        del rootcfg['level1'][rootcfg.asobj.level1.foo]
+        assert 'level1.foo' not in rootcfg._setting_index
+        with pytest.raises(KeyError):
+            rootcfg['level1.foo'] = 'zab'
+
+    def test_index_after_set_section(self):
+        rootcfg = generate_config_root()
+        assert rootcfg['level1.level2.baz'] == 'bat'
+        level2 = rootcfg['level1']['level2']
+        rootcfg.set_section('level2', level2)
+        assert rootcfg['level2.baz'] == 'bat'
+        assert rootcfg._section_index['level2'] is level2
+
+
+# ***
+
+class TestConfigDecoratorNameIndex:
+    def test_ambiguous_names_indexed(self):
+        rootcfg = generate_config_root()
+        with pytest.raises(KeyError):
+            rootcfg['conflict'] = 'zab'
+        conflicts = rootcfg._name_index['conflict']
+        assert len(conflicts) == 2
+        # Subsections only consider names beneath them.
+        assert rootcfg['level1']['level2']['conflict'] == 'level2'
+        assert rootcfg['level1'].find_setting(['conflict']).value == 'level1'
+
+    def test_name_index_maintained(self):
+        rootcfg = generate_config_root()
+        assert rootcfg['baz'] == 'bat'
+        rootcfg.setdefault('level1.level3.baz', 'value')
+        assert len(rootcfg._name_index['baz']) == 2
+        with pytest.raises(AttributeError):
+            rootcfg['baz']
+        del rootcfg['level1']['level3']['baz']
+        assert rootcfg['baz'] == 'bat'
+
+
+# ***
+
+class TestConfigDecoratorSectionPathCached:
+    def test_something(self):
+        rootcfg = generate_config_root()
+        level2 = rootcfg['level1']['level2']
+        assert level2.section_path() == 'level1.level2'
+        assert level2.section_path('_') == 'level1_level2'
+        assert level2.section_path([]) == ['level1', 'level2']
+        assert level2._path_parts == ('level1', 'level2')
+        assert level2.find_root() is rootcfg
+        # Re-rooting the parent section clears the cached paths beneath it.
+        newroot = ConfigDecorator.create_root_for_section('renamed', rootcfg['level1'])
+        assert level2.section_path() == 'renamed.level2'
+        assert level2.find_root() is newroot
+        assert newroot['renamed.level2.baz'] == 'bat'
+
+
+# ***
+
+class TestConfigDecoratorAsobjCached:
+    def test_proxy_reused(self):
+        rootcfg = generate_config_root()
+        assert rootcfg.asobj is rootcfg.asobj
+        assert rootcfg.asobj.level1 is rootcfg['level1'].asobj
+        assert rootcfg.asobj.level1._ is rootcfg['level1']
+
+    def test_proxy_cache_invalidated(self):
+        rootcfg = generate_config_root()
+        assert rootcfg.asobj.baz.value == 'bat'
+        rootcfg.setdefault('level1.level3.baz', 'value')
+        with pytest.raises(AttributeError):
+            rootcfg.asobj.baz
+
+    def test_deepcopy_after_proxy_used(self):
+        import copy
+
+        rootcfg = generate_config_root()
+        assert rootcfg.asobj.level1.foo.value == 'baz'
+        copied = copy.deepcopy(rootcfg)
+        assert copied['level1.foo'] == 'baz'
+        assert copied.asobj.level1.foo.value == 'baz'
+        copied['level1.foo'] = 'oof'
+        assert rootcfg['level1.foo'] == 'baz'
+
+
+# ***
+
+class TestConfigDecoratorExportPlan:
+    def test_plan_reused(self):
+        rootcfg = generate_config_root()
+        assert rootcfg.as_dict() == rootcfg.as_dict()
+        plans = dict(rootcfg._export_plans)
+        assert len(plans) == 1
+        rootcfg.as_dict()
+        for options, plan in rootcfg._export_plans.items():
+            assert plan is plans[options]
+        rootcfg.apply_items({})
+        assert len(rootcfg._export_plans) == 2
+
+    def test_plan_invalidated_by_schema_change(self):
+        rootcfg = generate_config_root()
+        assert 'level3' not in rootcfg.as_dict()['level1']
+        rootcfg.setdefault('level1.level3.baz', 'value')
+        assert rootcfg.as_dict()['level1']['level3'] == {'baz': 'value'}
+
+    def test_callable_predicates_asked_on_export(self):
+        hidden = [True]
+
+        @section(None)
+        class RootSection(object):
+            pass
 
+        @RootSection.section(None)
+        class RootSectionReal(object):
+            @property
+            @RootSection.setting('test', hidden=lambda ckv: hidden[0])
+            def foo(self):
+                return 'bar'
+
+        assert RootSection.as_dict() == {}
+        hidden[0] = False
+        assert RootSection.as_dict() == {'foo': 'bar'}
+
+    def test_empty_sections(self):
+        @section(None)
+        class RootSection(object):
+            pass
+
+        @RootSection.section('empty')
+        class RootSectionEmpty(object):
+            pass
+
+        config = {}
+        assert RootSection.apply_items(config) == 0
+        assert config == {}
+        assert RootSection.apply_items(config, keep_empties=True) == 0
+        assert config == {'empty': {}}
+
+
+# ***
+
+class TestSectionSettingValueUnmutatedCached:
+    def test_recover_called_once_per_change(self):
+        calls = []
+
+        def recover(value):
+            calls.append(value)
+            return 'level-{}'.format(value)
+
+        @section(None)
+        class RootSection(object):
+            pass
+
+        @RootSection.section(None)
+        class RootSectionReal(object):
+            @property
+            @RootSection.setting('test', recover=recover)
+            def foo(self):
+                return 10
+
+        setting = RootSection.asobj.foo
+        assert setting.value_unmutated == 'level-10'
+        assert setting.value_unmutated == 'level-10'
+        assert calls == [10]
+        setting.value_from_cliarg = 20
+        assert setting.value_unmutated == 'level-20'
+        assert calls == [10, 20]
+        # The config value's original input is preferred.
+        setting.value = '30'
+        assert setting.value_unmutated == '30'
+        assert RootSection.apply_items({}) == 1
+        assert calls == [10, 20]
+        setting.forget_config_value()
+        assert setting.value_unmutated == 'level-20'
+        assert calls == [10, 20, 20]
+
+    def test_dynamic_default_not_cached(self):
+        values = [1]
+
+        @section(None)
+        class RootSection(object):
+            pass
+
+        @RootSection.section(None)
+        class RootSectionReal(object):
+            @property
+            @RootSection.setting('test', dynamic_default=True)
+            def foo(self):
+                return values[0]
+
+        setting = RootSection.asobj.foo
+        assert setting.value_unmutated == '1'
+        values[0] = 2
+        assert setting.value_unmutated == '2'
+
+
+# ***
+
+class TestConfigDecoratorFlat:
+    def test_as_flat_dict(self):
+        rootcfg = generate_config_root()
+        flat = rootcfg.as_flat_dict()
+        assert flat['level1.foo'] == 'baz'
+        assert flat['level1.level2.baz'] == 'bat'
+        assert list(flat.items()) == list(rootcfg.iter_flat())
+        assert len(flat) == rootcfg.apply_items({}, unmutated=False)
+        assert rootcfg['level1'].as_flat_dict()['level2.baz'] == 'bat'
+
+    def test_update_flat(self):
+        rootcfg = generate_config_root()
+        unknown = []
+        errors = rootcfg.update_flat(
+            iter([('level1.foo', 'oof'), ('level1.nope', 1), ('level1', 2)]),
+            unknown=lambda path, value: unknown.append(path),
+        )
+        assert not errors
+        assert rootcfg['level1.foo'] == 'oof'
+        assert rootcfg.asobj.level1.foo.persisted
+        assert unknown == ['level1.nope', 'level1']
+        rootcfg['level1'].update_flat({'level2.baz': 'tab'})
+        assert rootcfg['level1.level2.baz'] == 'tab'
+
+    def test_update_flat_errors(self):
+        rootcfg = generate_config_root()
+        with pytest.raises(ValueError):
+            rootcfg.update_flat({'choices_test': 'invalid'})
+        errors = rootcfg.update_flat({'choices_test': 'invalid'}, errors_ok=True)
+        assert list(errors) == ['choices_test']
+
+
+# ***
+
+class TestConfigDecoratorIterExport:
+    def test_records(self):
+        rootcfg = generate_config_root()
+        rootcfg['level1.foo'] = 'oof'
+        records = list(rootcfg.iter_export())
+        assert (('level1', 'foo'), 'oof', 'config') in records
+        assert (('level1', 'level2', 'baz'), 'bat', 'default') in records
+        flat = rootcfg.as_flat_dict()
+        assert [parts for parts, _value, _source in records] == [
+            tuple(path.split('.')) for path in flat
+        ]
+
+    def test_filters(self):
+        rootcfg = generate_config_root()
+        rootcfg['level1.foo'] = 'oof'
+        assert list(rootcfg.iter_export(skip_unset=True)) == [
+            (('level1', 'foo'), 'oof', 'config'),
+        ]
+        assert (
+            (('level1', 'foo'), 'baz', 'default')
+            in rootcfg.iter_export(use_defaults=True)
+        )
+        names = [parts[-1] for parts, _value, _source in rootcfg.iter_export()]
+        assert 'inner_function' not in names
+        names = [
+            parts[-1] for parts, _value, _source
+            in rootcfg.iter_export(add_hidden=True)
+        ]
+        assert 'inner_function' in names
+
+    def test_depth_first(self):
+        rootcfg = generate_config_root()
+        records = rootcfg.iter_export()
+        first = next(records)
+        assert first == (('level1', 'level2', 'baz'), 'bat', 'default')
+
+
+# ***
+
+class TestConfigDecoratorIterSettings:
+    def test_order_matches_walk(self):
+        rootcfg = generate_config_root()
+        walked = []
+        rootcfg.walk(lambda condec, keyval: walked.append(keyval))
+        assert list(rootcfg.iter_settings()) == walked
+        assert walked[0]._section is rootcfg
+
+    def test_filters(self):
+        rootcfg = generate_config_root()
+        rootcfg['level1.foo'] = 'oof'
+        assert [ckv.name for ckv in rootcfg.iter_settings(persisted=True)] == ['foo']
+        assert [ckv.name for ckv in rootcfg.iter_settings(source='config')] == ['foo']
+        hidden = [ckv.name for ckv in rootcfg.iter_settings(hidden=True)]
+        assert 'inner_function' in hidden
+        assert 'foo' not in hidden
+        ephemeral = [ckv.name for ckv in rootcfg.iter_settings(ephemeral=True)]
+        assert 'ephemeral_test' in ephemeral
+        names = [ckv.name for ckv in rootcfg.iter_settings(under='level1.level2')]
+        assert names == ['baz', 'conflict']
+        with pytest.raises(KeyError):
+            list(rootcfg.iter_settings(under='level1.foo'))
+
+    def test_delete_while_iterating(self):
+        rootcfg = generate_config_root()
+        rootcfg['level1.foo'] = 'oof'
+        rootcfg.del_not_persisted(None)
+        assert [ckv.name for ckv in rootcfg.iter_settings()] == ['foo']
+        rootcfg.forget_config_values()
+        assert rootcfg['level1.foo'] == 'baz'
+
+
+# ***
+
+class TestConfigDecoratorSourceFacets:
+    def test_facets_follow_setters(self):
+        rootcfg = generate_config_root()
+        foo = rootcfg.asobj.level1.foo
+        baz = rootcfg.asobj.level1.level2.baz
+        assert list(rootcfg.iter_settings(persisted=True)) == []
+        assert rootcfg._facets is not None
+        foo.value = 'oof'
+        baz.value_from_forced = 'zab'
+        assert list(rootcfg.iter_settings(persisted=True)) == [foo]
+        assert list(rootcfg.iter_settings(source='forced')) == [baz]
+        assert list(rootcfg.iter_settings(source='cliarg')) == []
+        foo.value_from_cliarg = 'cli'
+        assert list(rootcfg.iter_settings(source='cliarg')) == [foo]
+        assert list(rootcfg.iter_settings(source='config')) == []
+        foo.forget_config_value()
+        assert list(rootcfg.iter_settings(persisted=True)) == []
+        assert list(rootcfg['level1.level2'].iter_settings(source='forced')) == [baz]
+        empty = rootcfg._sections['level1.2']
+        assert list(rootcfg.iter_settings(source='forced', under=empty)) == []
+
+    def test_facets_follow_schema(self):
+        rootcfg = generate_config_root()
+        rootcfg._facets_built()
+        rootcfg.setdefault('level1.level3.new', 'value')
+        new = rootcfg.asobj.level1.level3.new
+        assert list(rootcfg.iter_settings(persisted=True)) == [new]
+        del rootcfg['level1']['level3'][new]
+        assert list(rootcfg.iter_settings(persisted=True)) == []
+
+    def test_envvar_source(self):
+        import os
+
+        rootcfg = generate_config_root()
+        rootcfg.envvar_prefix = 'TEST_FACET_'
+        os.environ['TEST_FACET_LEVEL1_FOO'] = 'env'
+        try:
+            rootcfg.refresh_environ()
+            assert list(rootcfg.iter_settings(source='envvar')) == [
+                rootcfg.asobj.level1.foo,
+            ]
+        finally:
+            del os.environ['TEST_FACET_LEVEL1_FOO']
+
+    def test_skip_unset_export(self):
+        rootcfg = generate_config_root()
+        rootcfg['level1.level2.baz'] = 'zab'
+        assert rootcfg.as_dict(skip_unset=True) == {'level1': {'level2': {'baz': 'zab'}}}
+        assert list(rootcfg.iter_export(skip_unset=True)) == [
+            (('level1', 'level2', 'baz'), 'zab', 'config'),
+        ]
+        config = {}
+        rootcfg.apply_items(config, skip_unset=True, keep_empties=True)
+        assert config['level1'] == {'level2': {'baz': 'zab'}}
+        assert config['level1.2'] == {}
+
+
+# ***
+
+class TestConfigDecoratorIterMatching:
+    def test_glob(self):
+        rootcfg = generate_config_root()
+        foo = rootcfg.asobj.level1.foo
+        baz = rootcfg.asobj.level1.level2.baz
+        assert list(rootcfg.iter_matching('level1.foo')) == [foo]
+        assert list(rootcfg.iter_matching('level1.nope')) == []
+        assert list(rootcfg.iter_matching('nope.**')) == []
+        under_level1 = list(rootcfg.iter_matching('level1.**'))
+        assert under_level1 == list(rootcfg.iter_settings(under='level1'))
+        assert list(rootcfg.iter_matching('level1.*.baz')) == [baz]
+        assert list(rootcfg.iter_matching('**.ba?')) == [baz]
+        assert list(rootcfg.iter_matching('**.**.baz')) == [baz]
+        assert list(rootcfg['level1'].iter_matching('level2.b*')) == [baz]
+        conflicts = list(rootcfg.iter_matching('**.conflict'))
+        assert [ckv._section.section_path() for ckv in conflicts] == [
+            'level1', 'level1.level2',
+        ]
+        assert list(rootcfg.iter_matching('**')) == list(rootcfg.iter_settings())
+
+    def test_regex(self):
+        import re
+
+        rootcfg = generate_config_root()
+        baz = rootcfg.asobj.level1.level2.baz
+        assert list(rootcfg.iter_matching(re.compile(r'level2\.baz$'))) == [baz]
+        assert list(rootcfg['level1'].iter_matching(re.compile(r'^level2\.'))) == [
+            baz, rootcfg.asobj.level1.level2.conflict,
+        ]
+
+    def test_limit(self):
+        rootcfg = generate_config_root()
+        matches = rootcfg.iter_matching('**', limit=2)
+        assert len(list(matches)) == 2
+        assert next(rootcfg.iter_matching('**.conflict')).name == 'conflict'
+
+    def test_double_star_yields_each_setting_once(self):
+        @section(None)
+        class RootSection(object):
+            pass
+
+        RootSection.setdefault('x.a.a.b.b', 'deep')
+        RootSection.setdefault('x.a.c', 'shallow')
+        deep = RootSection.asobj.x.a.a.b.b
+        shallow = RootSection.asobj.x.a.c
+        assert list(RootSection.iter_matching('**.a.**.b')) == [deep]
+        assert list(RootSection.iter_matching('**.a.**')) == [shallow, deep]
+        assert list(RootSection.iter_matching('**.a.**', limit=2)) == [shallow, deep]
+
+
+# ***
+
+class TestConfigDecoratorGetSetMany:
+    def test_get_many(self):
+        rootcfg = generate_config_root()
+        assert rootcfg.get_many(['level1.foo', 'level1.level2.baz']) == {
+            'level1.foo': 'baz',
+            'level1.level2.baz': 'bat',
+        }
+        assert rootcfg['level1'].get_many(['level2.baz']) == {'level2.baz': 'bat'}
+        with pytest.raises(KeyError) as excinfo:
+            rootcfg.get_many(['level1.foo', 'nope', 'level1.nope'])
+        assert 'nope' in str(excinfo.value)
+        assert 'level1.nope' in str(excinfo.value)
+
+    def test_set_many(self):
+        rootcfg = generate_config_root()
+        errors = rootcfg.set_many({'level1.foo': 'oof', 'level1.level2.baz': 'zab'})
+        assert not errors
+        assert rootcfg['level1.foo'] == 'oof'
+        assert rootcfg.asobj.level1.level2.baz.source == 'config'
+        rootcfg.set_many([('level1.foo', 'cli')], source='cliarg')
+        assert rootcfg.asobj.level1.foo.value_from_cliarg == 'cli'
+        assert rootcfg.asobj.level1.foo.source == 'cliarg'
+        rootcfg['level1'].set_many({'foo': 'frc'}, source='forced')
+        assert rootcfg['level1.foo'] == 'frc'
+        with pytest.raises(ValueError):
+            rootcfg.set_many({'level1.foo': 'x'}, source='envvar')
+
+    def test_set_many_errors(self):
+        rootcfg = generate_config_root()
+        config = {
+            'level1.foo': 'oof',
+            'choices_test': 'invalid',
+            'nope': 'value',
+        }
+        with pytest.raises(ValueError) as excinfo:
+            rootcfg.set_many(config)
+        assert 'invalid' in str(excinfo.value)
+        assert 'nope' in str(excinfo.value)
+        # Nothing is set unless errors_ok.
+        assert rootcfg['level1.foo'] == 'baz'
+        errors = rootcfg.set_many(config, errors_ok=True)
+        assert sorted(errors) == ['choices_test', 'nope']
+        assert rootcfg['level1.foo'] == 'oof'
+
+    def test_dotted_section_name(self):
+        rootcfg = generate_config_root()
+        dotted = rootcfg._sections['level1.2']
+        dotted.setdefault('level2.baz', 'own')
+        # Same path when joined, but under level1 → 2 → level2 instead.
+        rootcfg.setdefault('level1.2.level2.baz', 'other')
+        assert dotted.get_many(['level2.baz']) == {'level2.baz': 'own'}
+        dotted.set_many({'level2.baz': 'set'})
+        assert dotted['level2.baz'] == 'set'
+        dotted.update_flat({'level2.baz': 'flat'})
+        assert dotted['level2.baz'] == 'flat'
+        assert rootcfg['level1']['2.level2.baz'] == 'other'
+        with pytest.raises(KeyError):
+            dotted.get_many(['level2.nope', 'nope.baz'])
+
+
+# ***
+
+class TestConfigDecoratorSettingHandle:
+    def test_value_cached_until_changed(self):
+        rootcfg = generate_config_root()
+        handle = rootcfg.handle('level1.level2.baz')
+        assert handle.value == 'bat'
+        assert handle._generation == rootcfg._generation
+        assert rootcfg['level1'].handle('level2.baz').setting is handle.setting
+        rootcfg['level1.level2.baz'] = 'zab'
+        assert handle._generation != rootcfg._generation
+        assert handle.value == 'zab'
+        handle.setting.value_from_forced = 'frc'
+        assert handle.value == 'frc'
+        handle.value = 'cfg'
+        assert handle.setting.value_from_config == 'cfg'
+        assert handle.value == 'frc'
+
+    def test_schema_changes(self):
+        rootcfg = generate_config_root()
+        rootcfg.setdefault('level1.level3.new', 'value')
+        handle = rootcfg.handle('level1.level3.new')
+        assert handle.value == 'value'
+        del rootcfg['level1']['level3']['new']
+        with pytest.raises(KeyError):
+            handle.value
+
+    def test_not_a_setting(self):
+        rootcfg = generate_config_root()
+        with pytest.raises(KeyError):
+            rootcfg.handle('level1')
+        with pytest.raises(KeyError):
+            rootcfg.handle('level1.nope')
+
+    def test_dynamic_default(self):
+        values = [1]
+
+        @section(None)
+        class RootSection(object):
+            pass
+
+        @RootSection.section(None)
+        class RootSectionReal(object):
+            @property
+            @RootSection.setting('test', dynamic_default=True)
+            def foo(self):
+                return values[0]
+
+        handle = RootSection.handle('foo')
+        assert handle.value == 1
+        values[0] = 2
+        assert handle.value == 2
+
+
+# ***
+
+class TestConfigDecoratorCompiledAccessors:
+    def test_reads(self):
+        rootcfg = generate_config_root()
+        acc = rootcfg.compile_accessors()
+        assert acc.level1.foo == 'baz'
+        assert acc.level1.level2.baz == 'bat'
+        assert acc.level1._ is rootcfg['level1']
+        assert not hasattr(acc, '__dict__')
+        rootcfg['level1.foo'] = 'oof'
+        assert acc.level1.foo == 'oof'
+        with pytest.raises(AttributeError):
+            acc.level1.nope
+        with pytest.raises(AttributeError):
+            acc.level1.foo = 'bar'
+
+    def test_cached_per_schema(self):
+        rootcfg = generate_config_root()
+        acc = rootcfg.compile_accessors()
+        assert rootcfg.compile_accessors() is acc
+        assert rootcfg['level1'].compile_accessors() is acc.level1
+        rootcfg.setdefault('level1.level3.new', 'value')
+        newacc = rootcfg.compile_accessors()
+        assert newacc is not acc
+        assert newacc.level1.level3.new == 'value'
+
+
+# ***
+
+class TestConfigDecoratorMaterialize:
+    def test_structure(self):
+        rootcfg = generate_config_root()
+        frozen = rootcfg.materialize()
+        assert frozen.level1.foo == 'baz'
+        assert frozen.level1.level2.baz == 'bat'
+        assert frozen.level1_2 == ()
+        assert frozen.level1._fields[0] == 'level2'
+        with pytest.raises(AttributeError):
+            frozen.level1.foo = 'oof'
+        assert not hasattr(frozen, '__dict__')
+
+    def test_unchanged_subtrees_shared(self):
+        rootcfg = generate_config_root()
+        frozen = rootcfg.materialize()
+        # The root section has ephemeral settings, which are dynamic
+        # defaults, so the root is made again, but not its subsections.
+        assert rootcfg.materialize().level1 is frozen.level1
+        rootcfg['level1.foo'] = 'oof'
+        refrozen = rootcfg.materialize()
+        assert refrozen.level1 is not frozen.level1
+        assert refrozen.level1.level2 is frozen.level1.level2
+        assert refrozen.level1_2 is frozen.level1_2
+        assert refrozen.level1.foo == 'oof'
+        assert frozen.level1.foo == 'baz'
+
+    def test_schema_change(self):
+        rootcfg = generate_config_root()
+        frozen = rootcfg.materialize()
+        rootcfg.setdefault('level1.level3.new', 'value')
+        refrozen = rootcfg.materialize()
+        assert refrozen.level1.level3.new == 'value'
+        assert not hasattr(frozen.level1, 'level3')
+
+    def test_dynamic_default_not_reused(self):
+        values = [1]
+
+        @section(None)
+        class RootSection(object):
+            pass
+
+        @RootSection.section('dynamic')
+        class RootSectionDynamic(object):
+            @property
+            @RootSection.setting('test', dynamic_default=True)
+            def foo(self):
+                return values[0]
+
+        @RootSection.section('static')
+        class RootSectionStatic(object):
+            @property
+            @RootSection.setting('test')
+            def bar(self):
+                return 'baz'
+
+        frozen = RootSection.materialize()
+        values[0] = 2
+        refrozen = RootSection.materialize()
+        assert (frozen.dynamic.foo, refrozen.dynamic.foo) == (1, 2)
+        assert refrozen.static is frozen.static
+
+    def test_values_frozen(self):
+        @section(None)
+        class RootSection(object):
+            pass
+
+        @RootSection.section('s')
+        class RootSectionS(object):
+            @property
+            @RootSection.setting('test')
+            def lst(self):
+                return [1, 2, 3]
+
+        frozen = RootSection.materialize()
+        assert frozen.s.lst == (1, 2, 3)
+        assert RootSection['s.lst'] == [1, 2, 3]
+
+
+# ***
+
+class TestConfigDecoratorSnapshot:
+    def test_snapshot(self):
+        rootcfg = generate_config_root()
+        snap = rootcfg.snapshot()
+        assert snap['level1']['foo'] == 'baz'
+        assert snap['level1.level2.baz'] == 'bat'
+        assert snap['level1.2'] == {}
+        assert snap.get('level1.nope') is None
+        with pytest.raises(KeyError):
+            snap['nope.nope']
+        assert list(snap['level1']) == ['level2', 'foo', 'conflict']
+        with pytest.raises(TypeError):
+            snap['level1']['foo'] = 'oof'
+        assert {snap: True}[rootcfg.snapshot()]
+
+    def test_values_frozen(self):
+        @section(None)
+        class RootSection(object):
+            pass
+
+        @RootSection.section(None)
+        class RootSectionReal(object):
+            @property
+            @RootSection.setting('test')
+            def numbers(self):
+                return [1, 2, 3]
+
+        snap = RootSection.snapshot()
+        assert snap['numbers'] == (1, 2, 3)
+        assert hash(snap) == hash(RootSection.snapshot())
+
+    def test_structural_sharing(self):
+        rootcfg = generate_config_root()
+        snap = rootcfg.snapshot()
+        rootcfg['level1.foo'] = 'oof'
+        resnap = rootcfg.snapshot()
+        assert resnap != snap
+        assert resnap['level1.level2'] is snap['level1.level2']
+        assert snap['level1.foo'] == 'baz'
+        assert resnap['level1.foo'] == 'oof'
+
+    def test_publish(self):
+        rootcfg = generate_config_root()
+        assert rootcfg.published is None
+        snap = rootcfg['level1'].publish()
+        assert rootcfg.published is snap
+        assert rootcfg['level1'].published is snap
+        rootcfg['level1.foo'] = 'oof'
+        # Readers see the old snapshot until the next publish.
+        assert rootcfg.published['level1.foo'] == 'baz'
+        rootcfg.publish()
+        assert rootcfg.published['level1.foo'] == 'oof'
+        assert snap['level1.foo'] == 'baz'